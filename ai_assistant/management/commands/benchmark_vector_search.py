@@ -0,0 +1,131 @@
+import io
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks HNSW nearest-neighbour search (latency, recall@k, index size) against an exact scan'
+
+    # mode -> (indexed expression with opclass, first-stage ordering); same as ai_assistant.utils
+    MODES = {
+        'full': ("embedding vector_l2_ops", "embedding <-> %(vector)s::vector"),
+        'halfvec': ("embedding_half halfvec_cosine_ops", "embedding_half <=> %(compact)s::halfvec"),
+        'binary': (
+            "(binary_quantize(embedding)::bit({dims})) bit_hamming_ops",
+            "binary_quantize(embedding)::bit({dims}) <~> binary_quantize(%(vector)s::vector)",
+        ),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Synthetic vectors to load')
+        parser.add_argument('--dimensions', type=int, default=1536)
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--m', type=int, default=16)
+        parser.add_argument('--ef-construction', type=int, default=64)
+        parser.add_argument('--ef-search', default='20,40,80,160', help='Comma-separated values to try')
+        parser.add_argument('--modes', default='full', help='Comma-separated: full, halfvec, binary')
+        parser.add_argument('--compact-dimensions', type=int, default=512, help='Dimensions kept by halfvec mode')
+        parser.add_argument('--candidates', type=int, default=100, help='Re-ranked candidates for halfvec/binary')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        dims, k = options['dimensions'], options['k']
+        compact = options['compact_dimensions']
+
+        # Everything lives in a temp table inside one transaction, so the
+        # real catalog is never touched and nothing is left behind.
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"CREATE TEMP TABLE vector_bench (id bigserial PRIMARY KEY, embedding vector({dims})) ON COMMIT DROP")
+
+            self.stdout.write(f"Loading {options['rows']} vectors ({dims} dims)...")
+            started = time.perf_counter()
+            centers = self._normalize(rng.standard_normal((64, dims)))
+            for start in range(0, options['rows'], 5000):
+                batch = min(5000, options['rows'] - start)
+                self._copy(cursor, self._sample(rng, centers, batch))
+            cursor.execute(
+                f"ALTER TABLE vector_bench ADD COLUMN embedding_half halfvec({compact}); "
+                f"UPDATE vector_bench SET embedding_half = l2_normalize(subvector(embedding, 1, {compact}))::halfvec({compact})"
+            )
+            cursor.execute("ANALYZE vector_bench")
+            self.stdout.write(f"  loaded in {time.perf_counter() - started:.1f}s")
+
+            vectors = self._sample(rng, centers, options['queries'])
+            queries = [
+                {'vector': self._literal(v), 'compact': self._literal(self._normalize(v[None, :compact])[0]), 'k': k}
+                for v in vectors
+            ]
+            exact_sql = "SELECT id FROM vector_bench ORDER BY embedding <-> %(vector)s::vector LIMIT %(k)s"
+
+            # Ground truth: exact sequential scan
+            exact, latencies = [], []
+            for query in queries:
+                started = time.perf_counter()
+                cursor.execute(exact_sql, query)
+                latencies.append(time.perf_counter() - started)
+                exact.append({row[0] for row in cursor.fetchall()})
+            self._report('exact scan', latencies, 1.0)
+
+            for mode in options['modes'].split(','):
+                self._benchmark_mode(cursor, mode, queries, exact, options)
+
+    def _benchmark_mode(self, cursor, mode, queries, exact, options):
+        dims, k, candidates = options['dimensions'], options['k'], options['candidates']
+        column, ordering = (part.format(dims=dims) for part in self.MODES[mode])
+        if mode == 'full':
+            search_sql = f"SELECT id FROM vector_bench ORDER BY {ordering} LIMIT %(k)s"
+        else:
+            # Same shape as hybrid_products: compact first stage, exact re-rank
+            search_sql = f"""
+                SELECT id FROM (
+                    SELECT id, embedding FROM vector_bench ORDER BY {ordering} LIMIT {candidates}
+                ) candidates
+                ORDER BY embedding <-> %(vector)s::vector LIMIT %(k)s
+            """
+
+        self.stdout.write(f"[{mode}] building HNSW index (m={options['m']}, ef_construction={options['ef_construction']})...")
+        started = time.perf_counter()
+        cursor.execute(
+            f"CREATE INDEX vector_bench_{mode}_idx ON vector_bench USING hnsw ({column}) "
+            f"WITH (m = {options['m']}, ef_construction = {options['ef_construction']})"
+        )
+        cursor.execute(f"SELECT pg_size_pretty(pg_relation_size('vector_bench_{mode}_idx'))")
+        self.stdout.write(f"  built in {time.perf_counter() - started:.1f}s, index size {cursor.fetchone()[0]}")
+
+        for ef_search in [int(value) for value in options['ef_search'].split(',')]:
+            # The scan returns at most ef_search rows, so it has to cover the candidates
+            if mode != 'full':
+                ef_search = max(ef_search, candidates)
+            cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", [str(ef_search)])
+            latencies, hits = [], 0
+            for query, truth in zip(queries, exact):
+                started = time.perf_counter()
+                cursor.execute(search_sql, query)
+                latencies.append(time.perf_counter() - started)
+                hits += len(truth & {row[0] for row in cursor.fetchall()})
+            self._report(f'{mode} ef_search={ef_search}', latencies, hits / (k * len(queries)))
+
+        cursor.execute(f"DROP INDEX vector_bench_{mode}_idx")
+
+    def _report(self, label, latencies, recall):
+        p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+        self.stdout.write(f"{label:<24} p50={p50:8.2f}ms  p99={p99:8.2f}ms  recall@k={recall:.3f}")
+
+    def _sample(self, rng, centers, count):
+        # Clustered like real product embeddings rather than uniform noise
+        picked = centers[rng.integers(0, len(centers), count)]
+        return self._normalize(picked + 0.3 * rng.standard_normal(picked.shape) / np.sqrt(centers.shape[1]))
+
+    def _normalize(self, vectors):
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _literal(self, vector):
+        return '[' + ','.join(f'{x:.6f}' for x in vector) + ']'
+
+    def _copy(self, cursor, vectors):
+        buffer = io.StringIO(''.join(self._literal(v) + '\n' for v in vectors))
+        cursor.copy_expert("COPY vector_bench (embedding) FROM STDIN", buffer)
@@ -1,20 +1,142 @@
-from pgvector.django import L2Distance
-from products.models import Product
-from products.utils import generate_product_embedding
+import re
+from contextlib import contextmanager
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Q, prefetch_related_objects
+from pgvector.django import HalfVectorField, VectorField
+from products.models import Product, ProductEmbedding, ProductVariant
+from products.utils import compact_embedding, generate_product_embedding
 
+# First-stage ordering per VECTOR_SEARCH_MODE. Each matches one of the HNSW indexes on
+# ProductEmbedding; the candidates it returns are re-ranked by exact L2 on the full embedding.
+CANDIDATE_ORDERING = {
+    'full': "embedding <-> %(vector)s::vector",
+    'halfvec': "embedding_half <=> %(compact)s::halfvec",
+    'binary': "binary_quantize(embedding)::bit(1536) <~> binary_quantize(%(vector)s::vector)",
+}
+
+
+@contextmanager
+def vector_search_session(candidates=0):
+    """
+    Applies the HNSW search breadth (hnsw.ef_search) to the queries run inside it.
+    SET LOCAL semantics, so pooled connections don't keep the value. An HNSW scan
+    returns at most ef_search rows, so it is raised to `candidates` if needed.
+    """
+    ef_search = max(settings.VECTOR_HNSW_EF_SEARCH, candidates)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('hnsw.ef_search', %s, true)",
+                [str(ef_search)],
+            )
+        yield
+
+
+def keyword_products(user_query, limit):
+    """
+    Cheap first leg: full-text rank plus exact SKU hits, no embedding needed.
+    """
+    search_query = SearchQuery(user_query, config='english', search_type='websearch')
+    skus = [token.upper() for token in re.findall(r'[\w-]+', user_query)]
+    sku_hit = Exists(ProductVariant.objects.filter(product=OuterRef('pk'), sku__in=skus, is_active=True))
+
+    return list(
+        Product.objects.annotate(rank=SearchRank(F('search_vector'), search_query), sku_hit=sku_hit)
+        .filter(Q(search_vector=search_query) | Q(sku_hit=True))
+        .only('id', 'name', 'description')
+        .order_by('-sku_hit', '-rank', 'id')[:limit]
+    )
+
+
+def hybrid_products(user_query, query_vector, limit):
+    """
+    Runs the keyword and vector legs and fuses them with reciprocal rank fusion
+    (score = sum of 1 / (k + position) over the legs) in a single statement.
+    """
+    table = Product._meta.db_table
+    vectors = ProductEmbedding._meta.db_table
+    candidate_ordering = CANDIDATE_ORDERING[settings.VECTOR_SEARCH_MODE]
+    sql = f"""
+        WITH keyword AS (
+            SELECT id, row_number() OVER (ORDER BY rank DESC, id) AS position
+            FROM (
+                SELECT id, ts_rank(search_vector, query) AS rank
+                FROM {table}, websearch_to_tsquery('english', %(query)s) query
+                WHERE is_active AND search_vector @@ query
+                ORDER BY rank DESC, id
+                LIMIT %(pool)s
+            ) ranked
+        ),
+        semantic AS (
+            SELECT id, row_number() OVER (ORDER BY distance, id) AS position
+            FROM (
+                SELECT id, embedding <-> %(vector)s::vector AS distance
+                FROM (
+                    SELECT v.product_id AS id, v.embedding
+                    FROM {vectors} v JOIN {table} p ON p.id = v.product_id
+                    WHERE p.is_active
+                    ORDER BY {candidate_ordering}
+                    LIMIT %(candidates)s
+                ) candidates
+                ORDER BY distance
+                LIMIT %(pool)s
+            ) nearest
+        ),
+        fused AS (
+            SELECT COALESCE(k.id, s.id) AS id,
+                   COALESCE(1.0 / (%(k)s + k.position), 0)
+                   + COALESCE(1.0 / (%(k)s + s.position), 0) AS score
+            FROM keyword k FULL OUTER JOIN semantic s ON k.id = s.id
+        )
+        SELECT p.id, p.name, p.description, fused.score
+        FROM fused JOIN {table} p ON p.id = fused.id
+        ORDER BY fused.score DESC, p.id
+        LIMIT %(limit)s
+    """
+    params = {
+        'query': user_query,
+        'vector': VectorField().get_prep_value(query_vector),
+        'compact': HalfVectorField().get_prep_value(compact_embedding(query_vector)),
+        'pool': settings.AI_RETRIEVAL_POOL,
+        # Re-ranking only widens the net for the compact modes
+        'candidates': (
+            settings.AI_RETRIEVAL_POOL if settings.VECTOR_SEARCH_MODE == 'full'
+            else max(settings.VECTOR_RERANK_CANDIDATES, settings.AI_RETRIEVAL_POOL)
+        ),
+        'k': settings.AI_RRF_K,
+        'limit': limit,
+    }
+    with vector_search_session(params['candidates']):
+        return list(Product.objects.raw(sql, params))
+
+
+def retrieve_products(user_query, limit=3):
+    products = keyword_products(user_query, limit)
+
+    # A SKU hit or a strong name match is good enough on its own: skip the OpenAI round-trip
+    if products and (products[0].sku_hit or products[0].rank >= settings.AI_KEYWORD_CONFIDENCE):
+        return products
 
-def find_relevant_products(user_query, limit=3):
     query_vector = generate_product_embedding(user_query)
-    
-    # We use L2Distance (Euclidean) to find the 'nearest' vectors
-    results = Product.objects.annotate(
-        distance=L2Distance('embedding', query_vector)
-    ).order_by('distance')[:limit]
-    
+    if query_vector is None:
+        return products
+    return hybrid_products(user_query, query_vector, limit)
+
+
+def find_relevant_products(user_query, limit=3):
+    results = retrieve_products(user_query, limit)
+
+    # One query for every product's variants instead of one per product
+    prefetch_related_objects(
+        results,
+        Prefetch('variants', queryset=ProductVariant.objects.filter(is_active=True), to_attr='active_variants'),
+    )
+
     context = ""
     for p in results:
-        variants = p.variants.filter(is_active=True)
-        v_info = ", ".join([f"{v.variant_name} (${v.price})" for v in variants])
+        v_info = ", ".join([f"{v.variant_name} (${v.price})" for v in p.active_variants])
         context += f"Product: {p.name}\nDescription: {p.description}\nOptions: {v_info}\n\n"
-    
+
     return context
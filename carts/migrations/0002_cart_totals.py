@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('carts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        # Backfill from the existing items
+        migrations.RunSQL(
+            """
+            UPDATE carts_cart c SET item_count = s.item_count, total = s.total
+            FROM (
+                SELECT i.cart_id, sum(i.quantity) AS item_count, sum(i.quantity * v.price) AS total
+                FROM carts_cartitem i
+                JOIN products_productvariant v ON v.id = i.product_variant_id
+                GROUP BY i.cart_id
+            ) s
+            WHERE c.id = s.cart_id
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
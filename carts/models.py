@@ -2,7 +2,6 @@ from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from products.models import ProductVariant
-from django.db.models import F, Sum
 
 
 # Create your models here.
@@ -10,16 +9,17 @@ class Cart(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE , related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized from the items (units and sum of quantity * price), kept up to
+    # date by the statements that change items and repriced when a price changes
+    item_count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     def __str__(self):
         return f"Cart for {self.user.email}"
 
     @property
     def total_price(self):
-        result = self.items.aggregate(
-            total=Sum(F('quantity') * F('product_variant__price'))
-        )
-        return result['total'] or 0
+        return self.total
 
 
 """
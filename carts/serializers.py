@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from planet_core.serialization import ValuesSerializer
 from .models import Cart, CartItem
 
 
@@ -33,3 +34,65 @@ class CartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = ['id', 'items', 'total_price']
+
+
+class CartOperationSerializer(serializers.Serializer):
+    OPS = ['add', 'set', 'remove']
+
+    variant_sku = serializers.CharField(max_length=100)
+    op = serializers.ChoiceField(choices=OPS, default='add')
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+    def validate(self, data):
+        if data['op'] == 'add' and data['quantity'] < 1:
+            raise serializers.ValidationError("Quantity to add must be at least 1.")
+        return data
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(child=CartOperationSerializer(), allow_empty=False, max_length=100)
+
+
+class CartItemValues(ValuesSerializer):
+    fields = {
+        'id': 'id',
+        'product_variant': 'product_variant_id',
+        'variant_name': 'product_variant__variant_name',
+        'price': 'product_variant__price',
+        'quantity': 'quantity',
+    }
+    extra = ('cart_id',)
+
+
+def serialize_carts(carts):
+    """
+    Same output as CartSerializer(many=True) from two queries, without per-item
+    serializer fields or a SUM query per cart.
+    """
+    cart_ids = list(carts.values_list('id', flat=True))
+    items = CartItemValues.group_by(
+        CartItemValues.values(CartItem.objects.filter(cart_id__in=cart_ids).order_by('id')),
+        'cart_id',
+    )
+
+    return [cart_data(cart_id, items.get(cart_id, [])) for cart_id in cart_ids]
+
+
+def cart_data(cart_id, items):
+    """
+    One cart in CartSerializer's shape from CartItemValues-style item dicts.
+    """
+    total = 0
+    for item in items:
+        subtotal = item['price'] * item['quantity']
+        total += subtotal
+        # CartSerializer's ReadOnlyFields rendered these as JSON numbers
+        item['price'], item['subtotal'] = float(item['price']), float(subtotal)
+    return {'id': cart_id, 'items': items, 'total_price': float(total)}
+
+
+def cart_summary(item_count, total):
+    """
+    What the header badge needs; the total is a JSON number like total_price.
+    """
+    return {'item_count': item_count, 'total_price': float(total)}
@@ -1,7 +1,9 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
+from products.models import ProductVariant
 from .models import Cart
+from .totals import reprice_variant
 
 """
 Every user should have a cart so create one for them automatically.
@@ -12,3 +14,14 @@ def create_user_cart(sender, instance, created, **kwargs):
     if created:
         Cart.objects.create(user=instance)
 
+
+"""
+Cart totals are stored on the Cart row, so carts holding a variant are repriced
+when it's saved (only rows whose total actually changes are written).
+"""
+
+@receiver(post_save, sender=ProductVariant)
+def reprice_carts(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'price' not in update_fields):
+        return
+    reprice_variant(instance.pk)
@@ -0,0 +1,462 @@
+"""
+Where cart contents live between checkouts, picked with settings.CART_STORE.
+
+- 'database' (default): every mutation goes straight to Cart/CartItem.
+- 'redis': carts are Redis hashes (variant id -> quantity) mutated by small Lua
+  scripts, and written behind to Cart/CartItem by the `flush_carts` beat task
+  and, synchronously, at checkout. Postgres is always complete at checkout time.
+"""
+import logging
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection, transaction
+from products.models import ProductVariant
+from .models import Cart, CartItem
+from .serializers import cart_data, cart_summary, serialize_carts
+from .totals import recalculate_totals
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownVariants(Exception):
+    """
+    Some SKUs in a batch don't exist (or can't be added any more); nothing was applied.
+    """
+    def __init__(self, skus):
+        super().__init__(', '.join(skus))
+        self.skus = skus
+
+
+def resolve_variants(operations):
+    """
+    {sku: variant id} for a batch in one query. Inactive variants can still be removed.
+    """
+    skus = {operation['variant_sku'] for operation in operations}
+    found = {
+        sku: (variant_id, is_active)
+        for sku, variant_id, is_active in ProductVariant.all_objects.filter(sku__in=skus).values_list('sku', 'id', 'is_active')
+    }
+    unknown = sorted({
+        operation['variant_sku'] for operation in operations
+        if operation['variant_sku'] not in found
+        or (operation['op'] != 'remove' and not found[operation['variant_sku']][1])
+    })
+    if unknown:
+        raise UnknownVariants(unknown)
+    return {sku: variant_id for sku, (variant_id, _) in found.items()}
+
+
+def fold_operations(operations, variant_ids):
+    """
+    Collapses a batch to one change per variant, ('add', n) or ('set', n) where
+    ('set', 0) removes the item. Operations apply in order, so 'set 2, add 1' is 'set 3'.
+    """
+    changes = {}
+    for operation in operations:
+        variant_id, op = variant_ids[operation['variant_sku']], operation['op']
+        if op == 'remove':
+            changes[variant_id] = ('set', 0)
+        elif op == 'set':
+            changes[variant_id] = ('set', operation['quantity'])
+        else:
+            mode, quantity = changes.get(variant_id, ('add', 0))
+            changes[variant_id] = (mode, quantity + operation['quantity'])
+    return changes
+
+
+def _sql(statement):
+    return statement.format(
+        carts=Cart._meta.db_table,
+        items=CartItem._meta.db_table,
+        variants=ProductVariant._meta.db_table,
+    )
+
+
+# The user's cart, created in the same statement if there is none yet. The
+# `variant` CTE (id, price, quantity) is what goes in it: no row, no new cart.
+# A new cart starts with that item's totals; an existing one is adjusted by the caller.
+CART_CTE = """
+    existing AS (
+        SELECT id FROM {carts} WHERE user_id = %(user)s ORDER BY id LIMIT 1
+    ), created AS (
+        INSERT INTO {carts} (user_id, item_count, total, created_at, updated_at)
+        SELECT %(user)s, variant.quantity, variant.quantity * variant.price, now(), now()
+        FROM variant WHERE NOT EXISTS (SELECT 1 FROM existing)
+        RETURNING id
+    ), cart AS (
+        SELECT id FROM existing UNION ALL SELECT id FROM created
+    )
+"""
+
+# Concurrent adds of the same variant both land: the increments happen under the
+# row locks, and the cart's totals move by the same delta in the same statement
+ADD = """
+    WITH variant AS (
+        SELECT id, price, %(quantity)s::int AS quantity FROM {variants} WHERE sku = %(sku)s AND is_active
+    ), """ + CART_CTE + """, upserted AS (
+        INSERT INTO {items} (cart_id, product_variant_id, quantity)
+        SELECT cart.id, variant.id, variant.quantity FROM cart, variant
+        ON CONFLICT (cart_id, product_variant_id) DO UPDATE SET quantity = {items}.quantity + EXCLUDED.quantity
+        RETURNING quantity
+    ), totals AS (
+        UPDATE {carts} c
+        SET item_count = c.item_count + variant.quantity, total = c.total + variant.quantity * variant.price,
+            updated_at = now()
+        FROM existing, variant WHERE c.id = existing.id
+    )
+    SELECT quantity FROM upserted
+"""
+
+# Locks the item, then either lowers its quantity or deletes it; returns what's left
+REDUCE = """
+    WITH target AS (
+        SELECT i.id, i.cart_id, i.quantity, v.price, LEAST(i.quantity, %(quantity)s) AS taken
+        FROM {items} i
+        JOIN {carts} c ON c.id = i.cart_id
+        JOIN {variants} v ON v.id = i.product_variant_id
+        WHERE c.user_id = %(user)s AND v.sku = %(sku)s
+        FOR UPDATE OF i
+    ), removed AS (
+        DELETE FROM {items} WHERE id IN (SELECT id FROM target WHERE quantity <= %(quantity)s)
+        RETURNING 0 AS quantity
+    ), reduced AS (
+        UPDATE {items} i SET quantity = i.quantity - %(quantity)s
+        FROM target t WHERE i.id = t.id AND t.quantity > %(quantity)s
+        RETURNING i.quantity
+    ), totals AS (
+        UPDATE {carts} c
+        SET item_count = c.item_count - t.taken, total = c.total - t.taken * t.price, updated_at = now()
+        FROM target t WHERE c.id = t.cart_id
+    )
+    SELECT quantity FROM removed UNION ALL SELECT quantity FROM reduced
+"""
+
+REMOVE = """
+    WITH removed AS (
+        DELETE FROM {items} i
+        USING {carts} c, {variants} v
+        WHERE c.id = i.cart_id AND v.id = i.product_variant_id AND c.user_id = %(user)s AND v.sku = %(sku)s
+        RETURNING i.cart_id, i.quantity, v.price
+    )
+    UPDATE {carts} c
+    SET item_count = c.item_count - r.quantity, total = c.total - r.quantity * r.price, updated_at = now()
+    FROM removed r WHERE c.id = r.cart_id
+    RETURNING c.id
+"""
+
+ENSURE_CART = "WITH variant AS (SELECT 0 AS quantity, 0 AS price), " + CART_CTE + "SELECT id FROM cart"
+
+UPSERT = """
+    INSERT INTO {items} (cart_id, product_variant_id, quantity)
+    SELECT %(cart)s, t.variant_id, t.quantity FROM unnest(%(variants)s::bigint[], %(quantities)s::int[]) AS t(variant_id, quantity)
+    ON CONFLICT (cart_id, product_variant_id) DO UPDATE SET quantity = {update}
+"""
+
+
+class DatabaseCartStore:
+    """
+    Reads and writes Cart/CartItem directly, each mutation as a single statement.
+    """
+    def add(self, user, sku, quantity):
+        """
+        New quantity, None if there's no active variant with this SKU.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(_sql(ADD), {'user': user.id, 'sku': sku, 'quantity': quantity})
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def reduce(self, user, sku, quantity):
+        """
+        Remaining quantity (0 when the item was removed), None if it wasn't in the cart.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(_sql(REDUCE), {'user': user.id, 'sku': sku, 'quantity': quantity})
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def remove(self, user, sku):
+        with connection.cursor() as cursor:
+            cursor.execute(_sql(REMOVE), {'user': user.id, 'sku': sku})
+            return cursor.fetchone() is not None
+
+    def apply(self, user, operations):
+        """
+        A whole batch in one transaction and at most six statements, however many
+        operations it has.
+        """
+        changes = fold_operations(operations, resolve_variants(operations))
+        removed = [variant_id for variant_id, (mode, quantity) in changes.items() if mode == 'set' and not quantity]
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(_sql(ENSURE_CART), {'user': user.id})
+            cart_id = cursor.fetchone()[0]
+            if removed:
+                CartItem.objects.filter(cart_id=cart_id, product_variant_id__in=removed).delete()
+            for mode, update in (('add', '{items}.quantity + EXCLUDED.quantity'), ('set', 'EXCLUDED.quantity')):
+                rows = [(variant_id, quantity) for variant_id, (m, quantity) in changes.items() if m == mode and quantity]
+                if rows:
+                    cursor.execute(
+                        _sql(UPSERT.replace('{update}', update)),
+                        {'cart': cart_id, 'variants': [r[0] for r in rows], 'quantities': [r[1] for r in rows]},
+                    )
+            recalculate_totals([cart_id])
+
+    def carts(self, user):
+        return serialize_carts(Cart.objects.filter(user=user))
+
+    def summary(self, user):
+        # Straight from the Cart row: one indexed lookup, no items touched
+        cart = Cart.objects.filter(user=user).order_by('id').values('item_count', 'total').first()
+        return cart_summary(cart['item_count'], cart['total']) if cart else cart_summary(0, 0)
+
+    def flush(self, user_id):
+        pass
+
+    def flush_dirty(self):
+        return 0
+
+    def discard(self, user_id):
+        pass
+
+
+# KEYS[1] = cart hash, KEYS[2] = dirty set; ARGV[1] = user id. Every script returns -2
+# when the hash isn't loaded yet (the caller loads it from Postgres and retries).
+_PREAMBLE = """
+if redis.call('HEXISTS', KEYS[1], '_cart') == 0 then return -2 end
+redis.call('SADD', KEYS[2], ARGV[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[2]))
+"""
+
+# ARGV[3] = variant id, ARGV[4] = quantity (ADD and REDUCE)
+ADD_SCRIPT = _PREAMBLE + """
+return redis.call('HINCRBY', KEYS[1], ARGV[3], tonumber(ARGV[4]))
+"""
+
+REDUCE_SCRIPT = _PREAMBLE + """
+local current = redis.call('HGET', KEYS[1], ARGV[3])
+if not current then return -1 end
+local left = tonumber(current) - tonumber(ARGV[4])
+if left <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[3])
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[3], left)
+return left
+"""
+
+REMOVE_SCRIPT = _PREAMBLE + """
+return redis.call('HDEL', KEYS[1], ARGV[3])
+"""
+
+# ARGV[3...] = mode, variant id, quantity for each folded change of a batch
+BATCH_SCRIPT = _PREAMBLE + """
+for i = 3, #ARGV, 3 do
+    local quantity = tonumber(ARGV[i + 2])
+    if ARGV[i] == 'add' then
+        redis.call('HINCRBY', KEYS[1], ARGV[i + 1], quantity)
+    elseif quantity > 0 then
+        redis.call('HSET', KEYS[1], ARGV[i + 1], quantity)
+    else
+        redis.call('HDEL', KEYS[1], ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+# Fills the hash from Postgres unless someone else already did (ARGV = field, value, ...)
+LOAD_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], '_cart') == 1 then return 0 end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+return 1
+"""
+
+NOT_LOADED = -2
+MISSING = -1
+
+
+class RedisCartStore:
+    """
+    Carts as Redis hashes: `_cart` holds the Cart id (and marks the hash as loaded),
+    every other field is a variant id with its quantity.
+    """
+    dirty_key = 'carts:dirty'
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.CART_REDIS_URL, decode_responses=True)
+        self.ttl = settings.CART_REDIS_TTL
+        self._add = self.client.register_script(ADD_SCRIPT)
+        self._reduce = self.client.register_script(REDUCE_SCRIPT)
+        self._remove = self.client.register_script(REMOVE_SCRIPT)
+        self._batch = self.client.register_script(BATCH_SCRIPT)
+        self._load = self.client.register_script(LOAD_SCRIPT)
+
+    def key(self, user_id):
+        return f'cart:{user_id}'
+
+    def add(self, user, sku, quantity):
+        variant_id = ProductVariant.objects.filter(sku=sku).values_list('id', flat=True).first()
+        if variant_id is None:
+            return None
+        return self._run(self._add, user, [variant_id, quantity])
+
+    def reduce(self, user, sku, quantity):
+        variant_id = ProductVariant.all_objects.filter(sku=sku).values_list('id', flat=True).first()
+        if variant_id is None:
+            return None
+        left = self._run(self._reduce, user, [variant_id, quantity])
+        return None if left == MISSING else left
+
+    def remove(self, user, sku):
+        variant_id = ProductVariant.all_objects.filter(sku=sku).values_list('id', flat=True).first()
+        return variant_id is not None and bool(self._run(self._remove, user, [variant_id]))
+
+    def apply(self, user, operations):
+        """
+        A whole batch as one script call, so it applies atomically.
+        """
+        changes = fold_operations(operations, resolve_variants(operations))
+        args = []
+        for variant_id, (mode, quantity) in changes.items():
+            args += [mode, variant_id, quantity]
+        self._run(self._batch, user, args)
+
+    def carts(self, user):
+        self._ensure_loaded(user)
+        fields = self.client.hgetall(self.key(user.id))
+        cart_id = int(fields.pop('_cart'))
+        quantities = {int(variant_id): int(quantity) for variant_id, quantity in fields.items()}
+
+        # Items not flushed yet have no CartItem row, so no id
+        item_ids = dict(CartItem.objects.filter(cart_id=cart_id).values_list('product_variant_id', 'id'))
+        variants = ProductVariant.all_objects.filter(id__in=quantities).values('id', 'variant_name', 'price')
+        items = sorted(
+            (
+                {
+                    'id': item_ids.get(variant['id']),
+                    'product_variant': variant['id'],
+                    'variant_name': variant['variant_name'],
+                    'price': variant['price'],
+                    'quantity': quantities[variant['id']],
+                }
+                for variant in variants
+            ),
+            key=lambda item: (item['id'] is None, item['id'] or 0, item['product_variant']),
+        )
+        return [cart_data(cart_id, items)]
+
+    def summary(self, user):
+        # The Cart row lags behind Redis until the next flush, so sum the hash instead
+        self._ensure_loaded(user)
+        fields = self.client.hgetall(self.key(user.id))
+        fields.pop('_cart')
+        quantities = {int(variant_id): int(quantity) for variant_id, quantity in fields.items()}
+        prices = ProductVariant.all_objects.filter(id__in=quantities).values_list('id', 'price')
+        return cart_summary(
+            sum(quantities.values()),
+            sum((price * quantities[variant_id] for variant_id, price in prices), 0),
+        )
+
+    def flush(self, user_id):
+        """
+        Writes one cart to Postgres. The user is marked clean first, so a mutation
+        racing with the flush marks it dirty again and is picked up next time.
+        """
+        self.client.srem(self.dirty_key, user_id)
+        fields = self.client.hgetall(self.key(user_id))
+        if '_cart' not in fields:
+            return
+
+        cart_id = int(fields.pop('_cart'))
+        quantities = {int(variant_id): int(quantity) for variant_id, quantity in fields.items()}
+        try:
+            # A variant deleted since it was added would fail the whole cart on its FK, every time
+            existing = set(ProductVariant.all_objects.filter(id__in=quantities).values_list('id', flat=True))
+            gone = [variant_id for variant_id in quantities if variant_id not in existing]
+            if gone:
+                logger.warning(f'Dropping deleted variants {gone} from the cart of user {user_id}')
+                self.client.hdel(self.key(user_id), *gone)
+                quantities = {variant_id: quantities[variant_id] for variant_id in existing}
+
+            with transaction.atomic():
+                CartItem.objects.filter(cart_id=cart_id).exclude(product_variant_id__in=quantities).delete()
+                CartItem.objects.bulk_create(
+                    [
+                        CartItem(cart_id=cart_id, product_variant_id=variant_id, quantity=quantity)
+                        for variant_id, quantity in quantities.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['cart', 'product_variant'],
+                    update_fields=['quantity'],
+                )
+                recalculate_totals([cart_id])
+        except Exception:
+            self.client.sadd(self.dirty_key, user_id)
+            raise
+
+    def flush_dirty(self, batch_size=500):
+        """
+        One pass over the dirty carts. Users marked dirty again during the pass
+        (a failed flush, or a new change) are left for the next run, so one cart
+        that keeps failing can't keep this looping.
+        """
+        flushed, seen, again = 0, set(), set()
+        while True:
+            user_ids = self.client.spop(self.dirty_key, batch_size)
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                if user_id in seen:
+                    again.add(user_id)
+                    continue
+                seen.add(user_id)
+                try:
+                    self.flush(user_id)
+                    flushed += 1
+                except Exception as e:
+                    logger.error(f'Could not flush cart of user {user_id}: {e}')
+        if again:
+            self.client.sadd(self.dirty_key, *again)
+        return flushed
+
+    def discard(self, user_id):
+        """
+        Drops the Redis copy (e.g. after an order emptied the cart in Postgres);
+        the next access reloads it.
+        """
+        self.client.srem(self.dirty_key, user_id)
+        self.client.delete(self.key(user_id))
+
+    def _run(self, script, user, script_args):
+        keys = [self.key(user.id), self.dirty_key]
+        args = [user.id, self.ttl, *script_args]
+        result = script(keys=keys, args=args)
+        if result == NOT_LOADED:
+            self._ensure_loaded(user)
+            result = script(keys=keys, args=args)
+        return result
+
+    def _ensure_loaded(self, user):
+        key = self.key(user.id)
+        if self.client.hexists(key, '_cart'):
+            return
+
+        cart, _ = Cart.objects.get_or_create(user=user)
+        fields = ['_cart', cart.id]
+        for variant_id, quantity in CartItem.objects.filter(cart=cart).values_list('product_variant_id', 'quantity'):
+            fields += [variant_id, quantity]
+        self._load(keys=[key], args=[self.ttl, *fields])
+
+
+STORES = {
+    'database': DatabaseCartStore,
+    'redis': RedisCartStore,
+}
+
+
+@lru_cache(maxsize=None)
+def get_cart_store():
+    return STORES[settings.CART_STORE]()
@@ -0,0 +1,13 @@
+from celery import shared_task
+from .storage import get_cart_store
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_carts():
+    flushed = get_cart_store().flush_dirty()
+    if flushed:
+        logger.info(f'Flushed {flushed} carts to the database')
+    return f"Flushed {flushed} carts."
@@ -0,0 +1,57 @@
+"""
+Keeps Cart.item_count and Cart.total in step with the items. Single-item
+mutations adjust them inline (see storage.py); these recompute them from the
+items for batches, write-behind flushes and price changes.
+"""
+from django.db import connection
+from products.models import ProductVariant
+from .models import Cart, CartItem
+
+# Only carts whose totals actually differ are written
+RECALCULATE = """
+    UPDATE {carts} c SET item_count = s.item_count, total = s.total, updated_at = now()
+    FROM (
+        SELECT c2.id AS cart_id,
+               COALESCE(sum(i.quantity), 0) AS item_count,
+               COALESCE(sum(i.quantity * v.price), 0) AS total
+        FROM {carts} c2
+        LEFT JOIN {items} i ON i.cart_id = c2.id
+        LEFT JOIN {variants} v ON v.id = i.product_variant_id
+        WHERE {scope}
+        GROUP BY c2.id
+    ) s
+    WHERE c.id = s.cart_id AND (c.item_count, c.total) IS DISTINCT FROM (s.item_count, s.total)
+"""
+
+
+def _sql(scope):
+    return RECALCULATE.format(
+        scope=scope,
+        carts=Cart._meta.db_table,
+        items=CartItem._meta.db_table,
+        variants=ProductVariant._meta.db_table,
+    )
+
+
+def recalculate_totals(cart_ids):
+    cart_ids = list(cart_ids)
+    if not cart_ids:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(_sql("c2.id = ANY(%(carts)s)"), {'carts': cart_ids})
+        return cursor.rowcount
+
+
+def reprice_variant(variant_id):
+    """
+    Recomputes the carts holding this variant. A save that didn't change the
+    price reads their items and writes nothing.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _sql("c2.id IN (SELECT cart_id FROM {items} WHERE product_variant_id = %(variant)s)".format(
+                items=CartItem._meta.db_table,
+            )),
+            {'variant': variant_id},
+        )
+        return cursor.rowcount
@@ -1,61 +1,87 @@
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Cart, CartItem
-from products.models import ProductVariant
-from .serializers import CartSerializer
+from .models import Cart
+from .serializers import CartSerializer, CartBatchSerializer
+from .storage import UnknownVariants, get_cart_store
+from planet_core.serialization import FAST_RENDERERS
 
 
 class CartViewSet(viewsets.ModelViewSet):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERERS
 
     # --- CORE CRUD OPERATIONS ---
     def get_queryset(self):
         return Cart.objects.filter(user=self.request.user).prefetch_related('items__product_variant')
 
+    # Contents come from the cart store (settings.CART_STORE), in CartSerializer's shape
+    def list(self, request, *args, **kwargs):
+        return Response(get_cart_store().carts(request.user))
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        carts = [cart for cart in get_cart_store().carts(request.user) if str(cart['id']) == str(pk)]
+        if not carts:
+            raise Http404
+        return Response(carts[0])
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Item count and total for the header badge, without loading the items.
+        """
+        return Response(get_cart_store().summary(request.user))
+
     def create(self, request, *args, **kwargs):
         variant_sku = request.data.get('variant_sku')
         quantity = int(request.data.get('quantity', 1))
-        variant = get_object_or_404(ProductVariant, sku=variant_sku)
-        
-        cart, _ = Cart.objects.get_or_create(user=self.request.user)
-        item, created = CartItem.objects.get_or_create(cart=cart, product_variant=variant)
-        
-        if not created:
-            item.quantity += quantity
-        else:
-            item.quantity = quantity
-        
-        item.save()
+
+        if get_cart_store().add(request.user, variant_sku, quantity) is None:
+            raise Http404
         return Response({"message": "Item added to cart"}, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Applies many add/set/remove operations in one request and one transaction;
+        either all of them land or none do. Returns the updated cart.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        store = get_cart_store()
+        try:
+            store.apply(request.user, serializer.validated_data['operations'])
+        except UnknownVariants as e:
+            return Response(
+                {"error": "Unknown or unavailable variants", "skus": e.skus},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(store.carts(request.user)[0])
+
     # --- QUANTITY MANAGEMENT ---
     @action(detail=False, methods=['post'])
     def reduce_item(self, request):
         variant_sku = request.data.get('variant_sku')
         quantity = int(request.data.get('quantity', 1))
-        cart = self.get_queryset().first()
-        
-        item = get_object_or_404(CartItem, cart=cart, product_variant__sku=variant_sku)
-        
-        if item.quantity <= quantity:
-            item.delete()
+
+        left = get_cart_store().reduce(request.user, variant_sku, quantity)
+        if left is None:
+            raise Http404
+        if left == 0:
             return Response({"message": "Item removed from cart"}, status=status.HTTP_204_NO_CONTENT)
-        
-        item.quantity -= quantity
-        item.save()
+
         return Response({"message": f"Quantity reduced by {quantity}"}, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['delete'])
     def remove_item(self, request):
         variant_sku = request.data.get('variant_sku')
-        cart = self.get_queryset().first()
-        
-        item = get_object_or_404(CartItem, cart=cart, product_variant__sku=variant_sku)
-        item.delete()
+
+        if not get_cart_store().remove(request.user, variant_sku):
+            raise Http404
         return Response({"message": "Item completely removed"}, status=status.HTTP_204_NO_CONTENT)
     
     def destroy(self, request, *args, **kwargs):
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from planet_core.serialization import ValuesSerializer
 from .models import Order, OrderItem
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -18,3 +19,32 @@ class OrderSerializer(serializers.ModelSerializer):
             'items', 'created_at'
         ]
         read_only_fields = ['status', 'total_price', 'shipping_address_snapshot']
+
+
+class OrderItemValues(ValuesSerializer):
+    fields = {'id': 'id', 'variant_snapshot': 'variant_snapshot', 'quantity': 'quantity'}
+    extra = ('order_id',)
+
+
+class OrderValues(ValuesSerializer):
+    fields = {
+        'id': 'id',
+        'status': 'status',
+        'total_price': 'total_price',
+        'shipping_address_snapshot': 'shipping_address_snapshot',
+        'created_at': 'created_at',
+    }
+
+
+def serialize_orders(orders):
+    """
+    Same output as OrderSerializer(many=True), built from two .values() queries.
+    """
+    data = OrderValues.many(OrderValues.values(orders))
+    items = OrderItemValues.group_by(
+        OrderItemValues.values(OrderItem.objects.filter(order_id__in=[order['id'] for order in data]).order_by('id')),
+        'order_id',
+    )
+    for order in data:
+        order['items'] = items.get(order['id'], [])
+    return data
@@ -1,49 +1,221 @@
+import asyncio
+import random
+import threading
+import time
+from functools import lru_cache
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Worth another try on an idempotent call: Paystack overloaded or having a bad moment
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    """
+    Paystack has been failing; calls fail fast until the breaker lets a trial through.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures (timeouts, connection errors,
+    5xx) and fails fast for `reset_after` seconds. Then one trial call is let
+    through: success closes the breaker, failure opens it again. State is per
+    process, like the connection pool.
+    """
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_after:
+                raise CircuitOpen(f'Paystack circuit open after {self.failures} failures')
+            # Half-open: one trial at a time (a trial that never reported back is retried)
+            if self.trial_started is not None and now - self.trial_started < self.reset_after:
+                raise CircuitOpen('Paystack circuit half-open, trial call in progress')
+            self.trial_started = now
+
+    def record_success(self):
+        with self._lock:
+            self.reset()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_started is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.trial_started = None
+
+
+breaker = CircuitBreaker(settings.PAYSTACK_BREAKER_THRESHOLD, settings.PAYSTACK_BREAKER_RESET)
+
+
+def _headers():
+    return {
+        "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
+        "Content-Type": "application/json",
+    }
+
+
+@lru_cache(maxsize=None)
+def get_session():
+    """
+    One pooled session per process, so checkouts reuse warm TLS connections.
+    Retries are ours (below), not urllib3's.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=settings.PAYSTACK_POOL_SIZE, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update(_headers())
+    return session
+
+
+# An AsyncClient's connections belong to the event loop that opened them, and under
+# WSGI (async_to_sync) or asyncio.run every call can get a new loop: one client per loop.
+# The client's transports hold on to the loop, so entries are removed explicitly.
+async_clients = {}
+
+
+async def _client_lifetime(loop):
+    """
+    Holds the loop's client open. Left suspended, it is finalized by the loop's
+    shutdown_asyncgens() (asyncio.run and async_to_sync both call it) while the
+    loop still runs, which closes the client and its pooled connections.
+    """
+    client = httpx.AsyncClient(
+        headers=_headers(),
+        timeout=httpx.Timeout(settings.PAYSTACK_READ_TIMEOUT, connect=settings.PAYSTACK_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=settings.PAYSTACK_POOL_SIZE),
+    )
+    try:
+        yield client
+    finally:
+        async_clients.pop(loop, None)
+        await client.aclose()
+
+
+async def get_async_client():
+    """
+    Pooled client for async calls, shared by everything running on the current loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in async_clients:
+        lifetime = _client_lifetime(loop)
+        async_clients[loop] = (await anext(lifetime), lifetime)
+    return async_clients[loop][0]
+
+
+def _backoff(attempt):
+    # Full jitter: a random wait up to an exponentially growing cap, so retrying
+    # workers don't hit a recovering Paystack in lockstep
+    return random.uniform(0, settings.PAYSTACK_RETRY_BACKOFF * 2 ** attempt)
+
+
 class PaystackService:
     def __init__(self):
-        self.base_url = "https://api.paystack.co"
-        self.headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json",
-        }
+        self.base_url = settings.PAYSTACK_BASE_URL
+        self.timeout = (settings.PAYSTACK_CONNECT_TIMEOUT, settings.PAYSTACK_READ_TIMEOUT)
 
-    def initialize_paystack_payment(self, email, amount, tx_ref):
-        """
-        Sends order details to Paystack and returns a payment URL.
-        """
-        url = self.base_url + "/transaction/initialize"
+    def _attempts(self, idempotent):
+        # Only idempotent calls are retried: a re-sent initialize could create a second transaction
+        return 1 + (settings.PAYSTACK_MAX_RETRIES if idempotent else 0)
+
+    def _request(self, method, path, idempotent=False, **kwargs):
+        attempts = self._attempts(idempotent)
+        for attempt in range(attempts):
+            breaker.before_call()
+            try:
+                res = get_session().request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+            else:
+                if res.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    res.raise_for_status()
+                    return res.json()
+                breaker.record_failure()
+                if attempt == attempts - 1:
+                    res.raise_for_status()
+            time.sleep(_backoff(attempt))
+
+    async def _arequest(self, method, path, idempotent=False, **kwargs):
+        attempts = self._attempts(idempotent)
+        for attempt in range(attempts):
+            breaker.before_call()
+            try:
+                res = await (await get_async_client()).request(method, self.base_url + path, **kwargs)
+            except httpx.TransportError:
+                breaker.record_failure()
+                if attempt == attempts - 1:
+                    raise
+            else:
+                if res.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    res.raise_for_status()
+                    return res.json()
+                breaker.record_failure()
+                if attempt == attempts - 1:
+                    res.raise_for_status()
+            await asyncio.sleep(_backoff(attempt))
+
+    def _initialize_data(self, email, amount, tx_ref):
         # Paystack expects amount in KOBO so i will multiply amount by 100
-        data = {
+        return {
             "email": email,
             "amount": int(amount * 100),
             "reference": str(tx_ref),
             "callback_url": f"http://localhost:8000/api/orders/verify-payment/{tx_ref}",
         }
-        
+
+    def initialize_paystack_payment(self, email, amount, tx_ref):
+        """
+        Sends order details to Paystack and returns a payment URL.
+        """
         try:
-            res = requests.post(url, headers=self.headers, json=data)
-            res.raise_for_status()
-            return res.json()
-        except requests.exceptions.RequestException as e:
+            return self._request('POST', "/transaction/initialize", json=self._initialize_data(email, amount, tx_ref))
+        except (requests.exceptions.RequestException, CircuitOpen) as e:
             logger.error(f'Paystack Error: {e}')
             return None
 
-
     def verify_payment(self, tx_ref):
         """
         Sends order reference to Paystack and returns a payment status.
         """
-        url = self.base_url + f"/transaction/verify/{tx_ref}"
+        try:
+            return self._request('GET', f"/transaction/verify/{tx_ref}", idempotent=True)
+        except (requests.exceptions.RequestException, CircuitOpen) as e:
+            logger.error(f'Paystack verification Error: {e}')
+            return None
 
+    async def ainitialize_paystack_payment(self, email, amount, tx_ref):
         try:
-            res = requests.get(url, headers=self.headers)
-            res.raise_for_status()
-            return res.json()
-        except requests.exceptions.RequestException as e:
+            return await self._arequest('POST', "/transaction/initialize", json=self._initialize_data(email, amount, tx_ref))
+        except (httpx.HTTPError, CircuitOpen) as e:
+            logger.error(f'Paystack Error: {e}')
+            return None
+
+    async def averify_payment(self, tx_ref):
+        try:
+            return await self._arequest('GET', f"/transaction/verify/{tx_ref}", idempotent=True)
+        except (httpx.HTTPError, CircuitOpen) as e:
             logger.error(f'Paystack verification Error: {e}')
-            return None
\ No newline at end of file
+            return None
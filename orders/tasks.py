@@ -3,8 +3,9 @@ from django.db import transaction
 from django.conf import settings
 from django.core.mail import send_mail
 from .models import Order
-from products.models import ProductVariant
+from products.reservations import InsufficientStock, check_available, lock_variants, release
 from carts.models import Cart
+from carts.storage import get_cart_store
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,37 +21,40 @@ def process_order_payment(order_id):
             if order.status == 'confirmed':
                 return f"Order {order_id} already confirmed."
 
-            # Get and sort Variant IDs to prevent Deadlocks
-            variant_ids = sorted([item.variant_snapshot.get('id') for item in order.items.all()])
-            
-            # Lock the ProductVariant rows
-            variants = ProductVariant.objects.select_for_update().filter(id__in=variant_ids)
-
-            # Stock Check
+            quantities = {}
             for item in order.items.all():
                 v_id = item.variant_snapshot.get('id')
-                variant = variants.get(id=v_id)
-                if variant.stock_quantity < item.quantity:
-                    order.status = 'cancelled'
-                    order.save()
+                quantities[v_id] = quantities.get(v_id, 0) + item.quantity
 
-                    # Send Email to user
-                    send_mail(
-                        subject=f"Order Cancelled: #{order.id}",
-                        message="You tried to make an order but oops! didn't work🙂",
-                        from_email=settings.EMAIL_HOST_USER,
-                        recipient_list=[order.user.email],
-                        fail_silently=True,
-                    )
-                    logger.warning(f'Order {order_id} cancelled as a result of low stock')
-                    return f"Stock low for {variant.variant_name}. Order #{order_id} cancelled."
+            # Lock the ProductVariant rows (in id order, to prevent deadlocks)
+            variants = lock_variants(quantities)
 
-            # Deduct Stock & Update Order
-            for item in order.items.all():
-                v_id = item.variant_snapshot.get('id')
-                variant = variants.get(id=v_id)
-                variant.stock_quantity -= item.quantity
+            # Stock Check: stock minus what other orders still hold. This order's own
+            # reservation (if it hasn't expired) is exactly what it is converting.
+            try:
+                check_available(variants, quantities, exclude_order=order)
+            except InsufficientStock as e:
+                order.status = 'cancelled'
+                order.save()
+                release(order)
+
+                # Send Email to user
+                send_mail(
+                    subject=f"Order Cancelled: #{order.id}",
+                    message="You tried to make an order but oops! didn't work🙂",
+                    from_email=settings.EMAIL_HOST_USER,
+                    recipient_list=[order.user.email],
+                    fail_silently=True,
+                )
+                logger.warning(f'Order {order_id} cancelled as a result of low stock')
+                return f"Stock low for {e}. Order #{order_id} cancelled."
+
+            # Deduct Stock (the reservation becomes a real decrement) & Update Order
+            for v_id, quantity in quantities.items():
+                variant = variants[v_id]
+                variant.stock_quantity -= quantity
                 variant.save()
+            release(order)
 
             order.status = 'confirmed'
             order.save()
@@ -58,7 +62,10 @@ def process_order_payment(order_id):
             # Clear the User's Cart
             user_cart = Cart.objects.get(user=order.user)
             user_cart.items.all().delete()
+            user_cart.item_count, user_cart.total = 0, 0
             user_cart.save()
+            # The cart store may hold its own copy of the cart; drop it once this commits
+            transaction.on_commit(lambda: get_cart_store().discard(order.user_id))
 
             # Send Email to user
             send_mail(
@@ -76,6 +83,7 @@ def process_order_payment(order_id):
     except Exception as e:
         order.status = 'cancelled'
         order.save()
+        release(order)
 
         # Send Email to user
         send_mail(
@@ -1,3 +1,240 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from address.models import Address
+from carts.models import Cart, CartItem
+from products.models import Product, ProductVariant, StockReservation
+from .models import Order
+from .services import PaystackService, async_clients, breaker, get_async_client, get_session
 
-# Create your tests here.
+PAYSTACK_OK = {'status': True, 'data': {'authorization_url': 'https://checkout.paystack.com/test'}}
+product_numbers = count()
+
+
+@mock.patch('orders.views.PaystackService')
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='buyer@example.com', password='secret', first_name='Ada', last_name='Obi',
+        )
+        Address.objects.create(
+            user=self.user, label='home', country='Nigeria', state='Lagos', city='Ikeja',
+            street='1 Allen Avenue', phone_number='08000000000',
+        )
+        self.cart, _ = Cart.objects.get_or_create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, size, quantity=2):
+        for _ in range(size):
+            product = Product.objects.create(name=f'Product {next(product_numbers)}', description='Test product')
+            variant = ProductVariant.objects.create(
+                product=product, variant_name='Default', price=Decimal('5.50'), stock_quantity=10,
+            )
+            CartItem.objects.create(cart=self.cart, product_variant=variant, quantity=quantity)
+
+    def checkout(self, paystack):
+        paystack.return_value.initialize_paystack_payment.return_value = PAYSTACK_OK
+        return self.client.post(reverse('checkout-list'))
+
+    def test_query_count_does_not_grow_with_the_cart(self, paystack):
+        self.fill_cart(1)
+        with CaptureQueriesContext(connection) as small_cart:
+            response = self.checkout(paystack)
+        self.assertEqual(response.status_code, 201)
+
+        CartItem.objects.filter(cart=self.cart).delete()
+        self.fill_cart(12)
+        with self.assertNumQueries(len(small_cart.captured_queries)):
+            response = self.checkout(paystack)
+        self.assertEqual(response.status_code, 201)
+
+    def test_order_is_built_from_the_cart_snapshot(self, paystack):
+        self.fill_cart(3, quantity=2)
+
+        response = self.checkout(paystack)
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(tx_ref=response.data['tx_ref'])
+        self.assertEqual(order.total_price, Decimal('33.00'))
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(
+            sorted(item.variant_snapshot['sku'] for item in order.items.all()),
+            sorted(CartItem.objects.filter(cart=self.cart).values_list('product_variant__sku', flat=True)),
+        )
+        self.assertEqual(StockReservation.objects.filter(order=order).count(), 3)
+
+    def test_stock_reserved_by_another_order_is_unavailable(self, paystack):
+        self.fill_cart(1, quantity=4)
+        variant = CartItem.objects.get(cart=self.cart).product_variant
+        other = get_user_model().objects.create_user(
+            email='other@example.com', password='secret', first_name='Ngozi', last_name='Eze',
+        )
+        other_order = Order.objects.create(user=other, shipping_address_snapshot='-', total_price=0)
+        StockReservation.objects.create(
+            variant=variant, order=other_order, quantity=8, expires_at=timezone.now() + timedelta(minutes=15),
+        )
+
+        response = self.checkout(paystack)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+        paystack.return_value.initialize_paystack_payment.assert_not_called()
+
+
+class FakePaystack(BaseHTTPRequestHandler):
+    """
+    Answers like Paystack. `script` holds (status, delay) for the next requests;
+    once it runs out every request succeeds straight away.
+    """
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is visible
+    script = []
+    calls = []
+
+    def do_GET(self):
+        self.respond()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.respond()
+
+    def respond(self):
+        FakePaystack.calls.append((self.command, self.path, self.client_address[1]))
+        status, delay = FakePaystack.script.pop(0) if FakePaystack.script else (200, 0)
+        time.sleep(delay)
+        body = json.dumps({
+            'status': status == 200,
+            'data': {'status': 'success', 'authorization_url': 'https://checkout.paystack.com/fake'},
+        }).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakePaystackServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The client hung up on a deliberately slow response
+        pass
+
+
+@override_settings(
+    PAYSTACK_SECRET_KEY='sk_test_fake', PAYSTACK_CONNECT_TIMEOUT=0.5, PAYSTACK_READ_TIMEOUT=0.3,
+    PAYSTACK_MAX_RETRIES=2, PAYSTACK_RETRY_BACKOFF=0.01,
+)
+class PaystackServiceTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakePaystackServer(('127.0.0.1', 0), FakePaystack)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        FakePaystack.script, FakePaystack.calls = [], []
+        breaker.reset()
+        # Fresh pools built with the test settings
+        get_session.cache_clear()
+        async_clients.clear()
+        for name, value in (('threshold', 3), ('reset_after', 60)):
+            patcher = mock.patch.object(breaker, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with self.settings(PAYSTACK_BASE_URL=f'http://127.0.0.1:{self.server.server_port}'):
+            self.paystack = PaystackService()
+
+    def test_verify_is_retried_on_transient_errors(self):
+        FakePaystack.script = [(503, 0), (502, 0)]
+
+        verification = self.paystack.verify_payment('ref-1')
+
+        self.assertEqual(verification['data']['status'], 'success')
+        self.assertEqual(len(FakePaystack.calls), 3)
+
+    def test_initialize_is_not_retried(self):
+        FakePaystack.script = [(503, 0)]
+
+        self.assertIsNone(self.paystack.initialize_paystack_payment('buyer@example.com', Decimal('10.00'), 'ref-2'))
+        self.assertEqual(len(FakePaystack.calls), 1)
+
+    def test_slow_paystack_is_cut_off_by_the_timeout(self):
+        FakePaystack.script = [(200, 2)] * 3
+
+        started = time.monotonic()
+        self.assertIsNone(self.paystack.verify_payment('ref-3'))
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(len(FakePaystack.calls), 3)
+
+    def test_breaker_opens_and_fails_fast(self):
+        FakePaystack.script = [(503, 0)] * 3
+        self.assertIsNone(self.paystack.verify_payment('ref-4'))
+
+        self.assertIsNone(self.paystack.verify_payment('ref-4'))
+        self.assertIsNone(self.paystack.initialize_paystack_payment('buyer@example.com', Decimal('10.00'), 'ref-5'))
+        self.assertEqual(len(FakePaystack.calls), 3)
+
+    def test_breaker_closes_after_a_successful_trial(self):
+        FakePaystack.script = [(503, 0)] * 3
+        self.paystack.verify_payment('ref-6')
+        breaker.opened_at -= breaker.reset_after
+
+        self.assertIsNotNone(self.paystack.verify_payment('ref-6'))
+        self.assertEqual(breaker.failures, 0)
+        self.assertIsNone(breaker.opened_at)
+
+    def test_connections_are_pooled(self):
+        self.assertIs(get_session(), get_session())
+
+        self.paystack.verify_payment('ref-7')
+        self.paystack.verify_payment('ref-8')
+
+        ports = {port for _, _, port in FakePaystack.calls}
+        self.assertEqual(len(ports), 1)
+
+    async def test_async_verify_is_retried(self):
+        FakePaystack.script = [(503, 0)]
+
+        verification = await self.paystack.averify_payment('ref-9')
+
+        self.assertEqual(verification['data']['status'], 'success')
+        self.assertEqual(len(FakePaystack.calls), 2)
+
+    def test_async_client_works_across_event_loops(self):
+        async def verify(tx_ref):
+            return await self.paystack.averify_payment(tx_ref), await get_async_client()
+
+        # Each asyncio.run (like each async_to_sync call under WSGI) is a new loop
+        first, first_client = asyncio.run(verify('ref-10'))
+        second, second_client = asyncio.run(verify('ref-11'))
+
+        self.assertEqual(first['data']['status'], 'success')
+        self.assertEqual(second['data']['status'], 'success')
+        self.assertIsNot(first_client, second_client)
+        # Closed with their loops: no client or open connection is left behind
+        self.assertTrue(first_client.is_closed)
+        self.assertTrue(second_client.is_closed)
+        self.assertEqual(async_clients, {})
@@ -4,12 +4,18 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from carts.models import Cart
+from carts.storage import get_cart_store
 from address.models import Address
 from .models import Order, OrderItem
-from .serializers import OrderSerializer
+from .serializers import OrderSerializer, serialize_orders
+from planet_core.serialization import FAST_RENDERERS, gzip_response
 from .services import PaystackService
+from django.core.exceptions import ValidationError
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from .tasks import process_order_payment
+from products.reservations import InsufficientStock, release, reserve
+from django.db import transaction
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,10 +26,26 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = FAST_RENDERERS
 
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user).prefetch_related('items')
 
+    # Reads take the fast path (plain .values() rows), OrderSerializer stays the schema
+    @gzip_response
+    def list(self, request, *args, **kwargs):
+        return Response(serialize_orders(Order.objects.filter(user=request.user)))
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        try:
+            orders = serialize_orders(Order.objects.filter(user=request.user, pk=pk))
+        except (ValueError, ValidationError):
+            # Not a valid id (e.g. /my-orders/abc/), same as DRF's get_object_or_404
+            raise Http404
+        if not orders:
+            raise Http404
+        return Response(orders[0])
+
 
 class CheckoutView(viewsets.ViewSet):
     """
@@ -33,10 +55,17 @@ class CheckoutView(viewsets.ViewSet):
 
     def create(self, request):
         user = request.user
-        cart = Cart.objects.filter(user=user).first()
+        # Write any cart changes still held by the cart store to Postgres first
+        get_cart_store().flush(user.id)
+        cart = Cart.objects.filter(user=user).order_by('id').first()
+
+        # One snapshot of the cart: items with their variants and products in a single
+        # query. Everything below (stock pre-check, total, order items) is computed
+        # from it, so checkout costs the same number of queries for any cart size.
+        items = list(cart.items.select_related('product_variant__product').order_by('id')) if cart else []
 
         # Check if cart exist and not empty
-        if not cart or not cart.items.exists():
+        if not items:
             return Response({"error": "Cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Confirm address
@@ -44,34 +73,52 @@ class CheckoutView(viewsets.ViewSet):
         if not address:
             return Response({"error": "Please set a default shipping address"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Pre-check Stock
-        for item in cart.items.all():
-            if item.product_variant.stock_quantity < item.quantity:
+        # Pre-check Stock from the snapshot; reserve() below re-checks under lock
+        for item in items:
+            variant = item.product_variant
+            if not variant.is_active or variant.stock_quantity < item.quantity:
                 return Response(
-                    {"error": f"Item {item.product_variant.variant_name} is out of stock"},
+                    {"error": f"Item {variant.variant_name} is out of stock"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-        # Create Pending Order & Snapshots
-        order = Order.objects.create(
-            user=user,
-            shipping_address_snapshot=str(address),
-            total_price=cart.total_price,
-            status='pending'
-        )
+        quantities = {}
+        for item in items:
+            quantities[item.product_variant_id] = quantities.get(item.product_variant_id, 0) + item.quantity
+
+        try:
+            with transaction.atomic():
+                # Create Pending Order & Snapshots
+                order = Order.objects.create(
+                    user=user,
+                    shipping_address_snapshot=str(address),
+                    total_price=sum(item.product_variant.price * item.quantity for item in items),
+                    status='pending'
+                )
 
-        # Create the order items
-        for item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                quantity=item.quantity,
-                variant_snapshot={
-                    "id": item.product_variant.id,
-                    "sku": item.product_variant.sku,
-                    "name": item.product_variant.variant_name,
-                    "product_name": item.product_variant.product.name,
-                    "price_at_purchase": str(item.product_variant.price),
-                }
+                # Create the order items
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        quantity=item.quantity,
+                        variant_snapshot={
+                            "id": item.product_variant.id,
+                            "sku": item.product_variant.sku,
+                            "name": item.product_variant.variant_name,
+                            "product_name": item.product_variant.product.name,
+                            "price_at_purchase": str(item.product_variant.price),
+                        }
+                    )
+                    for item in items
+                ])
+
+                # Hold the stock while the user pays (stock other pending orders have
+                # reserved counts as gone)
+                reserve(order, quantities)
+        except InsufficientStock as e:
+            return Response(
+                {"error": f"Item {e} is out of stock"},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
         # Generate Paystack Link
@@ -82,7 +129,7 @@ class CheckoutView(viewsets.ViewSet):
             tx_ref=order.tx_ref
         )
 
-        if paystack_data.get('status'):
+        if paystack_data and paystack_data.get('status'):
             checkout_url = paystack_data['data']['authorization_url']
 
             return Response({
@@ -91,7 +138,8 @@ class CheckoutView(viewsets.ViewSet):
                 "checkout_url": checkout_url
             }, status=status.HTTP_201_CREATED)
 
-
+        # No payment link, no point holding the stock
+        release(order)
         return Response(
             {"error": "Could not generate payment link"}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -105,7 +153,7 @@ class VerifyPaymentView(APIView):
         paystack = PaystackService()
         verification = paystack.verify_payment(order.tx_ref)
 
-        if verification.get("status") and verification['data']['status'] == 'success':
+        if verification and verification.get("status") and verification['data']['status'] == 'success':
             process_order_payment.delay(order.id)
             return Response({"message": "Payment verified, processing order."}, status=200)
 
@@ -0,0 +1,33 @@
+import datetime
+import decimal
+
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+
+def _default(obj):
+    # orjson handles str/int/float/dict/list/datetime/uuid itself; this covers the rest
+    if isinstance(obj, decimal.Decimal):
+        # Same as DRF's COERCE_DECIMAL_TO_STRING
+        return str(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson (several times faster than the stdlib encoder).
+    Output matches JSONRenderer: compact separators, decimals as strings and UTC
+    datetimes ending in "Z".
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
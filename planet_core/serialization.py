@@ -0,0 +1,58 @@
+"""
+Fast read path for high-volume endpoints: rows come from .values() and are mapped
+to output dicts through a field map compiled once per class, then rendered by
+FastJSONRenderer. No ModelSerializer field machinery runs per row.
+"""
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from rest_framework.renderers import BrowsableAPIRenderer
+
+from .renderers import FastJSONRenderer
+
+# renderer_classes for views on the fast path
+FAST_RENDERERS = [FastJSONRenderer, BrowsableAPIRenderer]
+
+# Compresses responses when the client accepts gzip (bodies under 200 bytes are left alone)
+gzip_response = method_decorator(gzip_page)
+
+
+class ValuesSerializer:
+    """
+    Read-only counterpart of a ModelSerializer over .values() rows.
+
+    `fields` maps output keys to lookups, e.g. {'product_name': 'product__name'}.
+    `extra` names lookups a view needs on each row (pagination keys, ids to join
+    nested rows on) without returning them. Decimals and datetimes are left as
+    they are; the renderer formats them the way DRF would.
+    """
+    fields = {}
+    extra = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.lookups = tuple(dict.fromkeys([*cls.fields.values(), *cls.extra]))
+        cls.pairs = tuple(cls.fields.items())
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*cls.lookups)
+
+    @classmethod
+    def to_representation(cls, row):
+        return {key: row[lookup] for key, lookup in cls.pairs}
+
+    @classmethod
+    def many(cls, rows):
+        pairs = cls.pairs
+        return [{key: row[lookup] for key, lookup in pairs} for row in rows]
+
+    @classmethod
+    def group_by(cls, rows, lookup):
+        """
+        Representations grouped by one lookup (usually the parent's id), for
+        attaching nested rows fetched with a single query.
+        """
+        groups = {}
+        for row in rows:
+            groups.setdefault(row[lookup], []).append(cls.to_representation(row))
+        return groups
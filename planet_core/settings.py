@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party apps
     'rest_framework',
@@ -158,9 +159,31 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Catalog pagination (page size can be overridden per request with ?page_size=)
+CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', 20))
+CATALOG_MAX_PAGE_SIZE = int(os.getenv('CATALOG_MAX_PAGE_SIZE', 100))
+
+# Minimum pg_trgm word similarity for the typo-tolerant search fallback
+SEARCH_TRIGRAM_THRESHOLD = float(os.getenv('SEARCH_TRIGRAM_THRESHOLD', 0.3))
+
+# Lower bounds of the price histogram returned with ?facets=true (last bucket is open-ended)
+CATALOG_PRICE_BUCKETS = [0, 50, 100, 250, 500, 1000]
+
 # Details for paystack payment gateway
 PAYSTACK_SECRET_KEY = os.getenv('PAYSTACK_SECRET_KEY', '')
 PAYSTACK_PUBLIC_KEY = os.getenv('PAYSTACK_PUBLIC_KEY', '')
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+# Seconds; a slow Paystack must never hold a web worker indefinitely
+PAYSTACK_CONNECT_TIMEOUT = float(os.getenv('PAYSTACK_CONNECT_TIMEOUT', 3.05))
+PAYSTACK_READ_TIMEOUT = float(os.getenv('PAYSTACK_READ_TIMEOUT', 10))
+# Pooled connections per process
+PAYSTACK_POOL_SIZE = int(os.getenv('PAYSTACK_POOL_SIZE', 20))
+# Extra attempts for idempotent calls (verify), with jittered backoff starting around this many seconds
+PAYSTACK_MAX_RETRIES = int(os.getenv('PAYSTACK_MAX_RETRIES', 2))
+PAYSTACK_RETRY_BACKOFF = float(os.getenv('PAYSTACK_RETRY_BACKOFF', 0.5))
+# Consecutive failures that open the circuit, and seconds it stays open before a trial call
+PAYSTACK_BREAKER_THRESHOLD = int(os.getenv('PAYSTACK_BREAKER_THRESHOLD', 5))
+PAYSTACK_BREAKER_RESET = float(os.getenv('PAYSTACK_BREAKER_RESET', 30))
 
 
 # The URL for Redis (the 'inbox' for my celery tasks)
@@ -169,9 +192,98 @@ CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 # Where the results of the tasks will be stored
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
 
+# Periodic jobs (run `celery -A planet_core beat`)
+CELERY_BEAT_SCHEDULE = {
+    # Safety net for products whose debounced embedding run was missed
+    'embed-pending-products': {
+        'task': 'products.tasks.embed_pending_products',
+        'schedule': 10 * 60,
+    },
+    'prune-embedding-cache': {
+        'task': 'products.tasks.prune_embedding_cache',
+        'schedule': 24 * 60 * 60,
+    },
+    'prune-catalog-changes': {
+        'task': 'products.tasks.prune_catalog_changes',
+        'schedule': 24 * 60 * 60,
+    },
+    'release-expired-reservations': {
+        'task': 'products.tasks.release_expired_reservations',
+        'schedule': 60,
+    },
+    # Write-behind of carts held in Redis (only does work with CART_STORE=redis)
+    'flush-carts': {
+        'task': 'carts.tasks.flush_carts',
+        'schedule': 60,
+    },
+}
+
+# Cache (shares the Redis instance used by celery)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+        'KEY_PREFIX': 'planet',
+    }
+}
+
+# Catalog read cache: Redis entries expire on their own, the per-process LRU is bounded by size
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 60 * 60))
+CATALOG_LOCAL_CACHE_SIZE = int(os.getenv('CATALOG_LOCAL_CACHE_SIZE', 512))
+
+# Catalog change log (/api/products/changes/?since=): log rows per response and how long
+# they're kept; clients further behind than that get 410 and must re-sync
+CATALOG_CHANGES_PAGE_SIZE = int(os.getenv('CATALOG_CHANGES_PAGE_SIZE', 1000))
+CATALOG_CHANGES_RETENTION_DAYS = int(os.getenv('CATALOG_CHANGES_RETENTION_DAYS', 7))
+
+# Stock held for a pending order at checkout (seconds), and how many expired
+# reservations the sweeper deletes per statement
+STOCK_RESERVATION_TTL = int(os.getenv('STOCK_RESERVATION_TTL', 15 * 60))
+STOCK_RESERVATION_SWEEP_BATCH = int(os.getenv('STOCK_RESERVATION_SWEEP_BATCH', 1000))
+
+# Cart store: 'database' writes every cart change to Postgres, 'redis' keeps carts in
+# Redis hashes and writes them behind (flush-carts job, and always at checkout)
+CART_STORE = os.getenv('CART_STORE', 'database')
+CART_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+CART_REDIS_TTL = int(os.getenv('CART_REDIS_TTL', 7 * 24 * 60 * 60))
+
 # OpenAI API
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# Embedding backend: 'openai', 'hash' (offline and deterministic, for tests/CI/load
+# tests) or a dotted path to an EmbeddingProvider. Re-embed products after switching.
+EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'openai')
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv('EMBEDDING_MAX_BATCH_TOKENS', 100000))
+EMBEDDING_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', 3))
+EMBEDDING_REQUEST_TIMEOUT = int(os.getenv('EMBEDDING_REQUEST_TIMEOUT', 30))
+
+# Product embeddings are generated off the save path: saves within the debounce
+# window are embedded together, EMBEDDING_BATCH_SIZE texts per API call
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 100))
+EMBEDDING_DEBOUNCE_SECONDS = int(os.getenv('EMBEDDING_DEBOUNCE_SECONDS', 30))
+
+# Embedding cache: per-process LRU (entries, ~50 KB each) -> Redis -> Postgres.
+# The table is trimmed to the most recently used EMBEDDING_CACHE_MAX_ROWS daily.
+EMBEDDING_LOCAL_CACHE_SIZE = int(os.getenv('EMBEDDING_LOCAL_CACHE_SIZE', 128))
+EMBEDDING_CACHE_TIMEOUT = int(os.getenv('EMBEDDING_CACHE_TIMEOUT', 7 * 24 * 60 * 60))
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv('EMBEDDING_CACHE_MAX_ROWS', 100000))
+
+# AI assistant retrieval: candidates per leg, RRF constant, and the ts_rank above
+# which the keyword leg alone is trusted (no embedding call)
+AI_RETRIEVAL_POOL = int(os.getenv('AI_RETRIEVAL_POOL', 20))
+AI_RRF_K = int(os.getenv('AI_RRF_K', 60))
+AI_KEYWORD_CONFIDENCE = float(os.getenv('AI_KEYWORD_CONFIDENCE', 0.5))
+
+# HNSW candidate list size per vector query (higher = better recall, slower).
+# Pick it with `python manage.py benchmark_vector_search`.
+VECTOR_HNSW_EF_SEARCH = int(os.getenv('VECTOR_HNSW_EF_SEARCH', 40))
+
+# First-stage vector search: 'full' (1536-dim float), 'halfvec' (512-dim half
+# precision) or 'binary' (1 bit per dimension). The top VECTOR_RERANK_CANDIDATES
+# are always re-ranked exactly against the full embedding.
+VECTOR_SEARCH_MODE = os.getenv('VECTOR_SEARCH_MODE', 'full')
+VECTOR_RERANK_CANDIDATES = int(os.getenv('VECTOR_RERANK_CANDIDATES', 100))
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
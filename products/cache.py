@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_MODIFIED_KEY = 'catalog:modified'
+
+
+class LRUCache:
+    """
+    Small thread-safe, per-process LRU that sits in front of Redis.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LRUCache(settings.CATALOG_LOCAL_CACHE_SIZE)
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a flushed Redis never hands out a version
+        # that is still sitting in some worker's local LRU.
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidates every cached catalog entry at once by moving to a new version.
+    """
+    try:
+        cache.set(CATALOG_MODIFIED_KEY, time.time(), timeout=None)
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key not set yet, nothing cached under the old version either
+        return get_catalog_version()
+    except Exception as e:
+        logger.error(f'Could not bump catalog version: {e}')
+
+
+def get_catalog_modified():
+    """
+    Unix time of the last catalog write. Unknown (flushed Redis) counts as now,
+    which only costs clients one full response.
+    """
+    modified = cache.get(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        cache.add(CATALOG_MODIFIED_KEY, time.time(), timeout=None)
+        modified = cache.get(CATALOG_MODIFIED_KEY)
+    return modified
+
+
+def catalog_etag(name):
+    """
+    Strong validator for a catalog response: changes whenever the catalog version
+    does. None if Redis is unavailable, which just disables conditional requests.
+    """
+    try:
+        version = get_catalog_version()
+    except Exception as e:
+        logger.warning(f'Catalog cache unavailable, no ETag: {e}')
+        return None
+    return hashlib.sha1(f'{version}:{name}'.encode('utf-8')).hexdigest()
+
+
+def catalog_last_modified():
+    try:
+        return datetime.fromtimestamp(get_catalog_modified(), tz=timezone.utc)
+    except Exception as e:
+        logger.warning(f'Catalog cache unavailable, no Last-Modified: {e}')
+        return None
+
+
+def get_or_build(name, build):
+    """
+    Read-through lookup: local LRU, then Redis, then `build()` (the database).
+    `name` only has to be unique per resource, the catalog version is added here.
+    """
+    try:
+        version = get_catalog_version()
+    except Exception as e:
+        logger.warning(f'Catalog cache unavailable, reading from database: {e}')
+        return build()
+
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    key = f'catalog:{version}:{digest}'
+
+    value = local_cache.get(key)
+    if value is not None:
+        return value
+
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout=settings.CATALOG_CACHE_TIMEOUT)
+
+    local_cache.set(key, value)
+    return value
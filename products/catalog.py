@@ -0,0 +1,190 @@
+"""
+Keeps the CatalogEntry read model in step with the catalog tables. Every refresh
+is scoped to the products/variants a write touched: entries that are no longer
+sellable are deleted, the rest are upserted from the source tables, and every
+row that actually changed is appended to the CatalogChange log.
+"""
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from .models import CatalogChange, CatalogEntry, Category, Product, ProductVariant
+
+# One row per active variant of an active product. The lateral join collects the
+# product's categories plus their ancestors (categories whose path is a prefix).
+ENTRY_SELECT = """
+    SELECT v.id, p.id, v.sku, p.name, p.slug, p.description, v.variant_name, v.price, v.stock_quantity,
+           COALESCE(cats.ids, '{{}}'), COALESCE(cats.slugs, '{{}}')
+    FROM {variants} v
+    JOIN {products} p ON p.id = v.product_id
+    LEFT JOIN LATERAL (
+        SELECT array_agg(c.id ORDER BY c.path) AS ids, array_agg(c.slug ORDER BY c.path) AS slugs
+        FROM {categories} c
+        WHERE EXISTS (
+            SELECT 1
+            FROM {through} pc JOIN {categories} a ON a.id = pc.category_id
+            WHERE pc.product_id = p.id AND a.path LIKE c.path || '%%'
+        )
+    ) cats ON true
+    WHERE v.is_active AND p.is_active
+"""
+
+
+def _sql(statement, **extra):
+    return statement.format(
+        **extra,
+        entries=CatalogEntry._meta.db_table,
+        variants=ProductVariant._meta.db_table,
+        products=Product._meta.db_table,
+        categories=Category._meta.db_table,
+        through=Product.category.through._meta.db_table,
+        changes=CatalogChange._meta.db_table,
+    )
+
+
+INSERT = """
+    INSERT INTO {entries} (id, product_id, sku, product_name, product_slug, product_description,
+                           variant_name, price, stock_quantity, category_ids, category_slugs)
+"""
+
+# Only rows whose content actually changed are written (and logged). Also makes two
+# transactions refreshing the same variant safe: the later one wins.
+ON_CONFLICT = """
+    ON CONFLICT (id) DO UPDATE SET
+        product_id = EXCLUDED.product_id, sku = EXCLUDED.sku, product_name = EXCLUDED.product_name,
+        product_slug = EXCLUDED.product_slug, product_description = EXCLUDED.product_description,
+        variant_name = EXCLUDED.variant_name, price = EXCLUDED.price, stock_quantity = EXCLUDED.stock_quantity,
+        category_ids = EXCLUDED.category_ids, category_slugs = EXCLUDED.category_slugs
+    WHERE ({entries}.product_id, {entries}.sku, {entries}.product_name, {entries}.product_slug,
+           {entries}.product_description, {entries}.variant_name, {entries}.price,
+           {entries}.stock_quantity, {entries}.category_ids, {entries}.category_slugs)
+        IS DISTINCT FROM
+          (EXCLUDED.product_id, EXCLUDED.sku, EXCLUDED.product_name, EXCLUDED.product_slug,
+           EXCLUDED.product_description, EXCLUDED.variant_name, EXCLUDED.price,
+           EXCLUDED.stock_quantity, EXCLUDED.category_ids, EXCLUDED.category_slugs)
+    RETURNING id, sku
+"""
+
+# Entries in scope whose variant is gone or no longer sellable
+DELETE = """
+    DELETE FROM {entries} e
+    WHERE {scope} AND NOT EXISTS (
+        SELECT 1 FROM {variants} v JOIN {products} p ON p.id = v.product_id
+        WHERE v.id = e.id AND v.is_active AND p.is_active
+    )
+    RETURNING e.id, e.sku
+"""
+
+SCOPE = "({alias}product_id = ANY(%(products)s) OR {alias}id = ANY(%(variants)s))"
+
+# Held from a transaction's first log append until it commits, so log writers commit
+# in seq order and a reader never sees a seq while a lower one can still appear
+CHANGE_LOG_LOCK = 0x63617463  # 'catc'
+
+
+def _logged(statement):
+    """
+    Appends every row the statement returns to the change log, in the same statement.
+    """
+    return (
+        "WITH changed AS (" + statement + ") "
+        "INSERT INTO {changes} (entry_id, sku, op, created_at) SELECT id, sku, %(op)s, now() FROM changed"
+    )
+
+
+def _refresh(cursor, delete_scope, insert_scope, params):
+    cursor.execute("SELECT pg_advisory_xact_lock(%s)", [CHANGE_LOG_LOCK])
+    cursor.execute(
+        _sql(_logged(DELETE), scope=delete_scope),
+        {**params, 'op': CatalogChange.DELETE},
+    )
+    cursor.execute(
+        _sql(_logged(INSERT + ENTRY_SELECT + insert_scope + ON_CONFLICT)),
+        {**params, 'op': CatalogChange.UPSERT},
+    )
+
+
+def refresh_catalog(product_ids=(), variant_ids=()):
+    """
+    Brings the entries of these products (all their variants) and variants up to date.
+    """
+    product_ids, variant_ids = list(product_ids), list(variant_ids)
+    if not product_ids and not variant_ids:
+        return
+
+    params = {'products': product_ids, 'variants': variant_ids}
+    with transaction.atomic(), connection.cursor() as cursor:
+        _refresh(cursor, SCOPE.format(alias='e.'), ' AND ' + SCOPE.format(alias='v.'), params)
+
+
+def refresh_category(category_id):
+    """
+    A category was renamed, moved or deleted: refresh every product listed under it
+    (directly or through a subcategory), found via the entries that carry its id.
+    """
+    product_ids = CatalogEntry.objects.filter(category_ids__contains=[category_id]).values_list('product_id', flat=True)
+    refresh_catalog(product_ids=set(product_ids))
+
+
+def rebuild_catalog():
+    """
+    Full refresh, for backfills and repairs; normal writes never need it. Like any
+    refresh it only touches (and logs) rows that differ.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        _refresh(cursor, 'true', '', {})
+        cursor.execute(_sql("SELECT count(*) FROM {entries}"))
+        return cursor.fetchone()[0]
+
+
+class ChangeLogGap(Exception):
+    """
+    The requested position is older than the retained log; the client must re-sync.
+    """
+
+
+def change_log_head():
+    """
+    Highest seq a client can resume from. Appends are serialized until commit, so every
+    lower seq is already visible (or was rolled back and never will be).
+    """
+    return CatalogChange.objects.aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def changes_since(since, limit):
+    """
+    The log after `since`, collapsed to the latest state per variant: {entry id: sku}
+    to upsert, SKUs to delete, the seq to resume from and whether more is waiting.
+    """
+    oldest = CatalogChange.objects.aggregate(seq=Min('seq'))['seq']
+    if oldest is not None and since < oldest - 1:
+        raise ChangeLogGap
+
+    rows = list(
+        CatalogChange.objects.filter(seq__gt=since).order_by('seq')
+        .values_list('seq', 'entry_id', 'sku', 'op')[:limit + 1]
+    )
+
+    latest, position = {}, since
+    for seq, entry_id, sku, op in rows[:limit]:
+        latest[entry_id] = (sku, op)
+        position = seq
+
+    upserts = {entry_id: sku for entry_id, (sku, op) in latest.items() if op == CatalogChange.UPSERT}
+    deletes = [sku for sku, op in latest.values() if op == CatalogChange.DELETE]
+    return upserts, deletes, position, len(rows) > limit
+
+
+def prune_changes(days):
+    """
+    Drops log rows older than `days`, but always keeps the newest one: changes_since
+    detects a gap from the oldest kept seq, and an empty log would hide it. Cuts by seq,
+    since created_at is the transaction's start and doesn't follow seq order.
+    """
+    cutoff = CatalogChange.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=days),
+    ).aggregate(seq=Max('seq'))['seq']
+    if cutoff is None:
+        return 0
+    newest = CatalogChange.objects.aggregate(seq=Max('seq'))['seq']
+    return CatalogChange.objects.filter(seq__lte=min(cutoff, newest - 1)).delete()[0]
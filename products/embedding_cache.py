@@ -0,0 +1,129 @@
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .cache import LRUCache
+from .models import EmbeddingCache
+from .utils import content_hash
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'embeddings:stats:{}'
+STATS_TIERS = ('local', 'redis', 'database', 'miss')
+
+local_cache = LRUCache(settings.EMBEDDING_LOCAL_CACHE_SIZE)
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+def _redis_key(model, text_hash):
+    return f'embedding:{model}:{text_hash}'
+
+
+def _as_list(vector):
+    # pgvector hands back numpy arrays, the API plain lists
+    return vector.tolist() if hasattr(vector, 'tolist') else list(vector)
+
+
+def _count(tier, amount):
+    if not amount:
+        return
+    key = STATS_KEY.format(tier)
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+    except Exception as e:
+        logger.warning(f'Could not record embedding cache stats: {e}')
+
+
+def cached_embeddings(model, texts, fetch):
+    """
+    Looks texts up in the local LRU, then Redis, then the EmbeddingCache table,
+    and only sends what is still missing to `fetch` (one batched API call).
+    Results are written back to every tier above where they were found.
+    """
+    normalized = [normalize_text(text) for text in texts]
+    hashes = [content_hash(text) for text in normalized]
+    pending = dict(zip(hashes, normalized))
+    found = {}
+
+    for text_hash in list(pending):
+        vector = local_cache.get((model, text_hash))
+        if vector is not None:
+            found[text_hash] = vector
+            del pending[text_hash]
+    _count('local', len(found))
+
+    redis_hits = {}
+    if pending:
+        try:
+            keys = {_redis_key(model, text_hash): text_hash for text_hash in pending}
+            redis_hits = {keys[key]: vector for key, vector in cache.get_many(list(keys)).items()}
+        except Exception as e:
+            logger.warning(f'Embedding cache (redis) unavailable: {e}')
+        for text_hash in redis_hits:
+            del pending[text_hash]
+        _count('redis', len(redis_hits))
+
+    db_hits = {}
+    if pending:
+        rows = EmbeddingCache.objects.filter(model=model, text_hash__in=list(pending))
+        db_hits = {row.text_hash: _as_list(row.embedding) for row in rows}
+        if db_hits:
+            EmbeddingCache.objects.filter(model=model, text_hash__in=list(db_hits)).update(last_used_at=timezone.now())
+        for text_hash in db_hits:
+            del pending[text_hash]
+        _count('database', len(db_hits))
+
+    fetched = {}
+    if pending:
+        vectors = fetch(list(pending.values()))
+        fetched = dict(zip(pending, vectors))
+        EmbeddingCache.objects.bulk_create(
+            [EmbeddingCache(model=model, text_hash=text_hash, embedding=vector) for text_hash, vector in fetched.items()],
+            ignore_conflicts=True,
+        )
+        _count('miss', len(fetched))
+
+    to_redis = {**db_hits, **fetched}
+    if to_redis:
+        try:
+            cache.set_many(
+                {_redis_key(model, text_hash): vector for text_hash, vector in to_redis.items()},
+                timeout=settings.EMBEDDING_CACHE_TIMEOUT,
+            )
+        except Exception as e:
+            logger.warning(f'Embedding cache (redis) unavailable: {e}')
+
+    for text_hash, vector in {**redis_hits, **to_redis}.items():
+        local_cache.set((model, text_hash), vector)
+    found.update(redis_hits)
+    found.update(to_redis)
+
+    return [found[text_hash] for text_hash in hashes]
+
+
+def cache_stats():
+    counts = cache.get_many([STATS_KEY.format(tier) for tier in STATS_TIERS])
+    stats = {tier: counts.get(STATS_KEY.format(tier), 0) for tier in STATS_TIERS}
+    lookups = sum(stats.values())
+    stats['hit_rate'] = round((lookups - stats['miss']) / lookups, 4) if lookups else 0
+    stats['rows'] = EmbeddingCache.objects.count()
+    return stats
+
+
+def prune_cache(max_rows):
+    """
+    Keeps the `max_rows` most recently used embeddings and deletes the rest.
+    """
+    cutoff = (
+        EmbeddingCache.objects.order_by('-last_used_at')
+        .values_list('last_used_at', flat=True)[max_rows:max_rows + 1]
+        .first()
+    )
+    if cutoff is None:
+        return 0
+    deleted, _ = EmbeddingCache.objects.filter(last_used_at__lte=cutoff).delete()
+    return deleted
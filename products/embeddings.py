@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import math
+import random
+import re
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingInputError(Exception):
+    """
+    The provider rejected the input itself (not a transient failure): sending the
+    same texts again won't help.
+    """
+
+
+class EmbeddingProvider:
+    """
+    Turns texts into vectors. `model` names the vector space: it is part of the
+    embedding cache key, so two providers never share cached vectors.
+    """
+    model = None
+    dimensions = 1536
+
+    def embed_many(self, texts):
+        raise NotImplementedError
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    model = 'text-embedding-3-small'
+
+    # The API caps a request at 2048 inputs; we also cap the (estimated) tokens
+    max_batch_inputs = 2048
+    # Per-input limit of the model. An input over it fails the whole request with a 400.
+    max_input_tokens = 8191
+
+    def __init__(self):
+        # Created on first use, so importing the app needs neither a key nor the network
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            # Retries are ours (below), with jitter and across the whole batch
+            self._client = OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                max_retries=0,
+                timeout=settings.EMBEDDING_REQUEST_TIMEOUT,
+            )
+        return self._client
+
+    def embed_many(self, texts):
+        vectors = []
+        for batch in self._batches(texts):
+            vectors.extend(self._request(batch))
+        return vectors
+
+    def _truncate(self, text):
+        """
+        Cuts the text to max_input_tokens UTF-8 bytes. Every token covers at least
+        one byte, so that fits whatever the language (~2000 English words, far
+        more than any product needs).
+        """
+        encoded = text.encode('utf-8')
+        if len(encoded) <= self.max_input_tokens:
+            return text
+        logger.warning(f'Embedding input of {len(encoded)} bytes truncated to {self.max_input_tokens}')
+        return encoded[:self.max_input_tokens].decode('utf-8', errors='ignore')
+
+    def _batches(self, texts):
+        batch, tokens = [], 0
+        for text in map(self._truncate, texts):
+            # ~4 characters per token for English, good enough to stay under the limit
+            estimate = len(text) // 4 + 1
+            if batch and (tokens + estimate > settings.EMBEDDING_MAX_BATCH_TOKENS or len(batch) == self.max_batch_inputs):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(text)
+            tokens += estimate
+        if batch:
+            yield batch
+
+    def _request(self, batch):
+        import openai
+
+        retryable = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+        for attempt in range(settings.EMBEDDING_MAX_RETRIES + 1):
+            try:
+                response = self.client.embeddings.create(model=self.model, input=batch)
+                return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+            except openai.BadRequestError as e:
+                raise EmbeddingInputError(str(e)) from e
+            except retryable as e:
+                if attempt == settings.EMBEDDING_MAX_RETRIES:
+                    raise
+                # Exponential backoff with full jitter: 0-1s, 0-2s, 0-4s...
+                delay = random.uniform(0, 2 ** attempt)
+                logger.warning(f'Embedding request failed ({e}), retrying in {delay:.1f}s')
+                time.sleep(delay)
+
+
+class HashEmbeddingProvider(EmbeddingProvider):
+    """
+    Offline, deterministic embeddings for tests, CI and load tests.
+
+    Words and word pairs are hashed into buckets of a fixed-size vector (the
+    "hashing trick"), so texts sharing words end up close together. Not
+    semantic, but search, ranking and the whole pipeline behave realistically.
+    """
+    model = 'local-hash-v1'
+
+    def embed_many(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def _embed(self, text):
+        words = re.findall(r'\w+', text.lower())
+        features = words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+
+PROVIDERS = {
+    'openai': OpenAIEmbeddingProvider,
+    'hash': HashEmbeddingProvider,
+}
+
+
+@lru_cache(maxsize=None)
+def get_embedding_provider():
+    """
+    The provider named by settings.EMBEDDING_PROVIDER ('openai', 'hash' or a dotted path).
+    """
+    name = settings.EMBEDDING_PROVIDER
+    provider_class = PROVIDERS[name] if name in PROVIDERS else import_string(name)
+    return provider_class()
@@ -0,0 +1,64 @@
+import csv
+import json
+from .models import CatalogEntry
+
+# Same columns as the import format (plus the slug), so a feed can be re-imported.
+# `categories` lists every category the variant is shown under, ancestors included.
+EXPORT_COLUMNS = [
+    ('sku', 'sku'),
+    ('product_name', 'product_name'),
+    ('product_slug', 'product_slug'),
+    ('description', 'product_description'),
+    ('categories', 'category_slugs'),
+    ('variant_name', 'variant_name'),
+    ('price', 'price'),
+    ('stock_quantity', 'stock_quantity'),
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the line, so csv.writer formats one
+    row at a time without a buffer.
+    """
+    def write(self, value):
+        return value
+
+
+def export_catalog(file_format, chunk_size=2000):
+    """
+    Yields the sellable catalog as CSV or JSONL text, a chunk of rows at a time.
+    Rows come from a server-side cursor, so memory stays flat however big the
+    catalog is.
+    """
+    names = [name for name, _ in EXPORT_COLUMNS]
+    rows = (
+        CatalogEntry.objects.order_by('id')
+        .values_list(*[field for _, field in EXPORT_COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(names)
+
+        def encode(row):
+            # Lists (categories) as "slug-a|slug-b", like the importer expects
+            return writer.writerow(['|'.join(value) if isinstance(value, list) else value for value in row])
+    else:
+        def encode(row):
+            return json.dumps(dict(zip(names, row)), ensure_ascii=False, default=str) + '\n'
+
+    batch = []
+    for row in rows:
+        batch.append(encode(row))
+        if len(batch) == chunk_size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
@@ -0,0 +1,91 @@
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+from .models import Category
+
+TRUTHY = ('1', 'true', 'yes')
+
+
+def category_id(slug):
+    """
+    Id of the category with `slug`, or None if there is none.
+    """
+    return Category.objects.filter(slug=slug).values_list('id', flat=True).first()
+
+
+def _decimal_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: 'A valid number is required.'})
+
+
+def filter_variants(queryset, params):
+    """
+    Applies the public catalog filters from the query string to a CatalogEntry queryset.
+    """
+    category = params.get('category')
+    if category:
+        cat_id = category_id(category)
+        if cat_id is None:
+            return queryset.none()
+        # category_ids includes ancestors, so this also matches the whole subtree
+        queryset = queryset.filter(category_ids__contains=[cat_id])
+
+    min_price = _decimal_param(params, 'min_price')
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+
+    max_price = _decimal_param(params, 'max_price')
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    if params.get('in_stock', '').lower() in TRUTHY:
+        queryset = queryset.filter(stock_quantity__gt=0)
+
+    name = params.get('name')
+    if name:
+        queryset = queryset.filter(product_name__istartswith=name)
+
+    return queryset
+
+
+def variant_facets(queryset):
+    """
+    Per-category counts (each including its subcategories, like the filter) and
+    a price histogram for the filtered variants, as conditional aggregates in a
+    single query.
+    """
+    categories = list(Category.objects.values_list('id', 'slug'))
+    bounds = [Decimal(str(bound)) for bound in settings.CATALOG_PRICE_BUCKETS]
+    buckets = list(zip(bounds, bounds[1:] + [None]))
+
+    aggregates = {}
+    # One entry per variant, so plain counts (no DISTINCT over a join)
+    for cat_id, _ in categories:
+        aggregates[f'category_{cat_id}'] = Count('id', filter=Q(category_ids__contains=[cat_id]))
+    for index, (low, high) in enumerate(buckets):
+        condition = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+        aggregates[f'price_{index}'] = Count('id', filter=condition)
+
+    counts = queryset.order_by().aggregate(**aggregates)
+
+    return {
+        'categories': {
+            slug: counts[f'category_{cat_id}']
+            for cat_id, slug in categories
+            if counts[f'category_{cat_id}']
+        },
+        'price': [
+            {
+                'min': str(low),
+                'max': str(high) if high is not None else None,
+                'count': counts[f'price_{index}'],
+            }
+            for index, (low, high) in enumerate(buckets)
+        ],
+    }
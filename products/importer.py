@@ -0,0 +1,219 @@
+import csv
+import json
+import time
+import uuid
+from itertools import islice
+from django.db import DatabaseError, transaction
+from django.utils.text import slugify
+from rest_framework import serializers
+from .models import Category, Product, ProductVariant
+from .cache import bump_catalog_version
+from .catalog import refresh_catalog
+from .tasks import schedule_embedding_refresh
+from .utils import content_hash
+
+# Only the first errors are kept in the report; the total is always counted
+MAX_REPORTED_ERRORS = 1000
+SLUG_LENGTH = Product._meta.get_field('slug').max_length
+
+
+class CatalogRowSerializer(serializers.Serializer):
+    """
+    One row of an import file = one variant. Rows sharing a product_name belong
+    to the same product (an existing product with that name is reused).
+    """
+    product_name = serializers.CharField(max_length=200)
+    description = serializers.CharField()
+    categories = serializers.CharField(required=False, allow_blank=True, default='')
+    sku = serializers.CharField(max_length=100)
+    variant_name = serializers.CharField(max_length=200)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock_quantity = serializers.IntegerField(min_value=0)
+
+    def to_internal_value(self, data):
+        # JSONL files may send categories as a list, CSV files as "slug-a|slug-b"
+        if isinstance(data.get('categories'), list):
+            data = {**data, 'categories': '|'.join(data['categories'])}
+        return super().to_internal_value(data)
+
+
+class ImportReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.products_created = 0
+        self.variants_created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'products_created': self.products_created,
+            'variants_created': self.variants_created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(self.elapsed, 2),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def read_rows(stream, file_format):
+    """
+    Yields (line number, row dict) from a text stream without loading it all.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, {'__error__': f'Invalid JSON: {e}'}
+            continue
+        if isinstance(row, dict):
+            yield line_number, row
+        else:
+            yield line_number, {'__error__': 'Each line must be a JSON object.'}
+
+
+class CatalogImporter:
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.report = ImportReport()
+
+    def run(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.report.rows += len(chunk)
+            self.import_chunk(self.validate(chunk))
+        return self.report
+
+    def validate(self, chunk):
+        valid = []
+        for line, data in chunk:
+            if '__error__' in data:
+                self.report.add_error(line, {'row': data['__error__']})
+                continue
+            serializer = CatalogRowSerializer(data=data)
+            if serializer.is_valid():
+                valid.append((line, serializer.validated_data))
+            else:
+                errors = {field: [str(message) for message in messages] for field, messages in serializer.errors.items()}
+                self.report.add_error(line, errors)
+        return valid
+
+    def import_chunk(self, rows):
+        if not rows:
+            return
+
+        # Everything the chunk refers to is looked up with one query per table
+        category_slugs = {slug for _, row in rows for slug in self._slugs(row)}
+        categories = Category.objects.in_bulk(category_slugs, field_name='slug')
+        skus = [row['sku'] for _, row in rows]
+        taken_skus = set(ProductVariant.all_objects.filter(sku__in=skus).values_list('sku', flat=True))
+        names = {row['product_name'] for _, row in rows}
+        products = {}
+        for product in Product.all_objects.filter(name__in=names).only('id', 'name'):
+            products.setdefault(product.name, product)
+
+        accepted = []
+        for line, row in rows:
+            missing = [slug for slug in self._slugs(row) if slug not in categories]
+            if missing:
+                self.report.add_error(line, {'categories': f"Unknown category: {', '.join(missing)}"})
+            elif row['sku'] in taken_skus:
+                self.report.add_error(line, {'sku': 'A variant with this SKU already exists.'})
+            else:
+                taken_skus.add(row['sku'])
+                accepted.append((line, row))
+
+        try:
+            with transaction.atomic():
+                new_products = self._create_products([row for _, row in accepted], products)
+                variants = ProductVariant.objects.bulk_create([
+                    ProductVariant(
+                        product=products[row['product_name']],
+                        sku=row['sku'],
+                        variant_name=row['variant_name'],
+                        price=row['price'],
+                        stock_quantity=row['stock_quantity'],
+                    )
+                    for _, row in accepted
+                ])
+                Product.category.through.objects.bulk_create(
+                    [
+                        Product.category.through(product_id=products[row['product_name']].id, category_id=categories[slug].id)
+                        for _, row in accepted
+                        for slug in self._slugs(row)
+                    ],
+                    ignore_conflicts=True,
+                )
+                # bulk_create skips signals and Product.save, so do their work here
+                refresh_catalog(product_ids={products[row['product_name']].id for _, row in accepted})
+                transaction.on_commit(bump_catalog_version)
+                if new_products:
+                    transaction.on_commit(schedule_embedding_refresh)
+        except DatabaseError as e:
+            # Most likely a concurrent writer took a slug/SKU; the whole chunk is rolled back
+            # and the import carries on with the next one. Rows rejected above already have their error.
+            for line, _ in accepted:
+                self.report.add_error(line, {'chunk': f'Rolled back: {e}'})
+            return
+
+        self.report.products_created += len(new_products)
+        self.report.variants_created += len(variants)
+
+    def _create_products(self, rows, products):
+        new_products = {}
+        for row in rows:
+            name = row['product_name']
+            if name not in products and name not in new_products:
+                slug = slugify(name)[:SLUG_LENGTH].strip('-') or uuid.uuid4().hex[:8]
+                product = Product(name=name, slug=slug, description=row['description'])
+                product.content_hash = content_hash(product.embedding_text())
+                new_products[name] = product
+
+        if not new_products:
+            return []
+
+        # Same collision rule as Product.save, checked for the whole chunk at once. Slugs
+        # were cut to the column length, so two long names can collide within the chunk too.
+        slugs = [product.slug for product in new_products.values()]
+        taken = set(Product.all_objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        for product in new_products.values():
+            if product.slug in taken:
+                base = product.slug[:SLUG_LENGTH - 5].rstrip('-')
+                product.slug = f"{base}-{uuid.uuid4().hex[:4]}"
+            taken.add(product.slug)
+
+        # needs_embedding defaults to True, the embedding worker picks them up
+        created = Product.objects.bulk_create(new_products.values())
+        for product in created:
+            products[product.name] = product
+        return created
+
+    @staticmethod
+    def _slugs(row):
+        return [slug.strip() for slug in row['categories'].split('|') if slug.strip()]
@@ -0,0 +1,63 @@
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from planet_core.renderers import FastJSONRenderer
+from products.models import Product, ProductVariant
+from products.serializers import ProductVariantListSerializer, CatalogEntryValues
+
+
+class Command(BaseCommand):
+    help = 'Compares rows/sec of the ModelSerializer + JSONRenderer path and the .values() fast path for variant lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5, help='Best of N runs is reported')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        # In memory, so only serialization and rendering are measured (no database needed)
+        products = [Product(id=i, name=f'Product {i}', description='A product') for i in range(rows // 4 + 1)]
+        instances = [
+            ProductVariant(
+                id=i, product=products[i // 4], sku=f'SKU-{i:06d}', variant_name=f'Variant {i % 4}',
+                price=Decimal('19.99') + i % 100, stock_quantity=i % 50,
+            )
+            for i in range(rows)
+        ]
+        values = [
+            {
+                'id': v.id, 'product_id': v.product.id, 'sku': v.sku, 'product_name': v.product.name,
+                'variant_name': v.variant_name, 'price': v.price, 'stock_quantity': v.stock_quantity,
+            }
+            for v in instances
+        ]
+
+        self.stdout.write(f"{rows} rows, best of {options['repeat']}")
+        self._run(
+            'ModelSerializer + JSONRenderer', options['repeat'], rows,
+            lambda: ProductVariantListSerializer(instances, many=True).data,
+            JSONRenderer(),
+        )
+        self._run(
+            'ValuesSerializer + FastJSONRenderer', options['repeat'], rows,
+            lambda: CatalogEntryValues.many(values),
+            FastJSONRenderer(),
+        )
+
+    def _run(self, label, repeat, rows, serialize, renderer):
+        best_serialize = best_render = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serialize()
+            serialized = time.perf_counter()
+            body = renderer.render({'results': data})
+            rendered = time.perf_counter()
+            best_serialize = min(best_serialize, serialized - started)
+            best_render = min(best_render, rendered - serialized)
+
+        total = best_serialize + best_render
+        self.stdout.write(
+            f"{label:<36} serialize={rows / best_serialize:>10,.0f} rows/s  "
+            f"render={rows / best_render:>10,.0f} rows/s  total={rows / total:>10,.0f} rows/s  ({len(body):,} bytes)"
+        )
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from products.embedding_cache import cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Shows hit counts per tier and the overall hit rate of the embedding cache'
+
+    def handle(self, *args, **kwargs):
+        stats = cache_stats()
+        for tier in ('local', 'redis', 'database', 'miss'):
+            self.stdout.write(f"{tier:<10} {stats[tier]}")
+        self.stdout.write(f"hit rate   {stats['hit_rate']:.2%}")
+        self.stdout.write(f"rows       {stats['rows']}")
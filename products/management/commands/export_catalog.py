@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from products.exporter import export_catalog
+
+
+class Command(BaseCommand):
+    help = 'Streams the sellable catalog to a CSV or JSONL file (or stdout) with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='File to write; defaults to stdout')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='jsonl')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunks = export_catalog(options['format'], chunk_size=options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as stream:
+            for chunk in chunks:
+                stream.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Catalog written to {options['output']}"))
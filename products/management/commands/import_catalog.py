@@ -0,0 +1,33 @@
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Streams a CSV or JSONL catalog file into the database in batched chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file, one variant per row')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+
+        file_format = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'jsonl')
+        importer = CatalogImporter(chunk_size=options['chunk_size'])
+
+        self.stdout.write(f"Importing {path} ({file_format})...")
+        with path.open(newline='', encoding='utf-8') as stream:
+            report = importer.run(read_rows(stream, file_format))
+
+        for error in report.errors:
+            self.stderr.write(f"  line {error['line']}: {error['errors']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.rows} rows in {report.elapsed:.1f}s ({report.rows_per_second:.0f} rows/sec): "
+            f"{report.products_created} products, {report.variants_created} variants, "
+            f"{report.error_count} errors. Embeddings queued."
+        ))
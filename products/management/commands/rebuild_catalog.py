@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from products.cache import bump_catalog_version
+from products.catalog import rebuild_catalog
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the CatalogEntry read model from the catalog tables (repairs only, writes keep it current)'
+
+    def handle(self, *args, **kwargs):
+        rows = rebuild_catalog()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} catalog entries"))
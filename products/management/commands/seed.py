@@ -2,7 +2,7 @@ import uuid
 from django.core.management.base import BaseCommand
 from django.utils.text import slugify
 from products.models import Category, Product, ProductVariant
-from ai_assistant.utils import generate_product_embedding
+from products.tasks import embed_pending_products
 
 class Command(BaseCommand):
     help = 'Seeds the database with Planet Inc products'
@@ -192,18 +192,9 @@ class Command(BaseCommand):
 
         # Create Products and Variants
         for p_data in products_to_create:
-            combined_text = f"{p_data['name']}: {p_data['desc']}"
-            
-            # Generate the vector coordinate
-            self.stdout.write(f"Generating embedding for {p_data['name']}...")
-            vector = generate_product_embedding(combined_text)
-
             product, created = Product.all_objects.get_or_create(
                 name=p_data['name'],
-                defaults={
-                    'description': p_data['desc'],
-                    'embedding': vector
-                }
+                defaults={'description': p_data['desc']}
             )
             
             # Associate Categories
@@ -222,5 +213,9 @@ class Command(BaseCommand):
                     }
                 )
 
+        # Embed whatever is new or changed in batched API calls (nothing on a re-run)
+        self.stdout.write("Generating embeddings...")
+        self.stdout.write(embed_pending_products())
+
         self.stdout.write(self.style.SUCCESS('Successfully seeded Planet Inc. inventory!'))
 
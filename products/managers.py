@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Exists, Func, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
 # QuerySet and Manager to handle active/inactive products
 class ActiveQuerySet(models.QuerySet):
@@ -17,3 +19,41 @@ class ActiveManager(models.Manager):
     def all_with_inactive(self):
         return ActiveQuerySet(self.model, using=self._db)
 
+
+
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, path):
+        """
+        The category with this materialized path and everything below it.
+        """
+        return self.filter(path__startswith=path)
+
+    def with_product_counts(self):
+        """
+        Annotates each category with the number of distinct active products in
+        its whole subtree, as a correlated subquery so the tree stays one query.
+        """
+        from .models import Product
+
+        subtree_count = Product.objects.filter(
+            category__path__startswith=OuterRef('path')
+        ).order_by().values(
+            count=Func('id', function='COUNT', template='%(function)s(DISTINCT %(expressions)s)')
+        )
+        return self.annotate(product_count=Coalesce(Subquery(subtree_count), 0))
+
+    def lineage_of_product(self, product_id):
+        """
+        The product's categories plus all of their ancestors in one query, each
+        annotated with `assigned` (directly on the product or only an ancestor).
+        A category is an ancestor-or-self of an assigned one when its path is a
+        prefix of that category's path.
+        """
+        from .models import Product
+
+        through = Product.category.through.objects.filter(product_id=product_id)
+        return self.annotate(
+            assigned=Exists(through.filter(category_id=OuterRef('pk'))),
+        ).filter(
+            Exists(through.filter(category__path__startswith=OuterRef('path')))
+        )
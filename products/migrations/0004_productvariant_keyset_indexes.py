@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_productvariant_products_pr_sku_dcab68_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['product', 'id'], name='products_pr_product_beb238_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(fields=['price', 'id'], name='products_pr_price_210982_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:20
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_productvariant_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productvariant',
+            name='products_pr_product_beb238_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productvariant',
+            name='products_pr_price_210982_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='text_pattern_ops'), condition=models.Q(('is_active', True)), name='product_active_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['product', 'id'], name='variant_active_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariant',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price', 'id'], include=('product', 'stock_quantity'), name='variant_active_price_idx'),
+        ),
+    ]
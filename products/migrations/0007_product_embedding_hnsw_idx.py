@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:22
+
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='product_embedding_hnsw_idx', opclasses=['vector_l2_ops']),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    categories = list(Category.objects.order_by('id'))
+    by_id = {category.id: category for category in categories}
+
+    def build(category):
+        if not category.path:
+            parent_path = build(by_id[category.parent_id]) if category.parent_id else '/'
+            category.path = f"{parent_path}{category.id}/"
+            category.depth = category.path.count('/') - 2
+        return category.path
+
+    for category in categories:
+        build(category)
+    Category.objects.bulk_update(categories, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_embedding_hnsw_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
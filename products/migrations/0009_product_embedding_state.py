@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:25
+
+import hashlib
+from django.db import migrations, models
+
+
+def hash_existing_products(apps, schema_editor):
+    # Existing embeddings were generated from the current name/description on save
+    Product = apps.get_model('products', 'Product')
+    batch = []
+    for product in Product.objects.only('id', 'name', 'description', 'embedding').iterator(chunk_size=1000):
+        product.content_hash = hashlib.sha256(f"{product.name}: {product.description}".encode('utf-8')).hexdigest()
+        has_embedding = product.embedding is not None
+        product.embedding_hash = product.content_hash if has_embedding else ''
+        product.needs_embedding = not has_embedding
+        batch.append(product)
+        if len(batch) == 1000:
+            Product.objects.bulk_update(batch, ['content_hash', 'embedding_hash', 'needs_embedding'])
+            batch = []
+    Product.objects.bulk_update(batch, ['content_hash', 'embedding_hash', 'needs_embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_category_materialized_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='embedding_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='needs_embedding',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.RunPython(hash_existing_products, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('needs_embedding', True)), fields=['id'], name='product_needs_embedding_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:26
+
+import django.utils.timezone
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_embedding_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=1536)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='products_em_last_us_60c6b8_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'text_hash'), name='unique_embedding_cache_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:27
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import pgvector.django.bit
+import pgvector.django.halfvec
+import pgvector.django.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_embedding_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='embedding_half',
+            field=pgvector.django.halfvec.HalfVectorField(blank=True, dimensions=512, null=True),
+        ),
+        # Same truncate + re-normalize as products.utils.compact_embedding (pgvector >= 0.7)
+        migrations.RunSQL(
+            "UPDATE products_product SET embedding_half = l2_normalize(subvector(embedding, 1, 512))::halfvec(512) "
+            "WHERE embedding IS NOT NULL",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding_half'], m=16, name='product_embedding_half_idx', opclasses=['halfvec_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=pgvector.django.indexes.HnswIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.comparison.Cast(models.Func('embedding', function='binary_quantize'), output_field=pgvector.django.bit.BitField(length=1536)), name='bit_hamming_ops'), ef_construction=64, m=16, name='product_embedding_bit_idx'),
+        ),
+    ]
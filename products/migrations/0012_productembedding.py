@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:05
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.db.models.functions.comparison
+import pgvector.django.bit
+import pgvector.django.halfvec
+import pgvector.django.indexes
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_compact_embeddings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductEmbedding',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vectors', serialize=False, to='products.product')),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=1536)),
+                ('embedding_half', pgvector.django.halfvec.HalfVectorField(dimensions=512)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        # Copy before the old columns go; the indexes are built once, after the copy
+        migrations.RunSQL(
+            "INSERT INTO products_productembedding (product_id, embedding, embedding_half, updated_at) "
+            "SELECT id, embedding, COALESCE(embedding_half, l2_normalize(subvector(embedding, 1, 512))::halfvec(512)), now() "
+            "FROM products_product WHERE embedding IS NOT NULL",
+            migrations.RunSQL.noop,
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_embedding_hnsw_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_embedding_half_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_embedding_bit_idx',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='embedding',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='embedding_half',
+        ),
+        migrations.AddIndex(
+            model_name='productembedding',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='product_embedding_hnsw_idx', opclasses=['vector_l2_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='productembedding',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding_half'], m=16, name='product_embedding_half_idx', opclasses=['halfvec_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='productembedding',
+            index=pgvector.django.indexes.HnswIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.comparison.Cast(models.Func('embedding', function='binary_quantize'), output_field=pgvector.django.bit.BitField(length=1536)), name='bit_hamming_ops'), ef_construction=64, m=16, name='product_embedding_bit_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:35
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_productembedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogEntry',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('sku', models.CharField(max_length=100)),
+                ('product_name', models.CharField(max_length=200)),
+                ('product_slug', models.SlugField()),
+                ('product_description', models.TextField()),
+                ('variant_name', models.CharField(max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock_quantity', models.PositiveIntegerField()),
+                ('category_ids', django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), default=list, size=None)),
+                ('category_slugs', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), default=list, size=None)),
+                ('search_vector', models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('product_name', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('product_description', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField())),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+            options={
+                'verbose_name_plural': 'catalog entries',
+                'indexes': [models.Index(fields=['product', 'id'], name='catalog_product_idx'), models.Index(fields=['price', 'id'], include=('stock_quantity',), name='catalog_price_idx'), django.contrib.postgres.indexes.GinIndex(fields=['category_ids'], name='catalog_category_ids_idx'), models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('product_name'), name='text_pattern_ops'), name='catalog_name_prefix_idx'), django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='catalog_search_vector_idx'), django.contrib.postgres.indexes.GinIndex(fields=['product_name'], name='catalog_name_trgm_idx', opclasses=['gin_trgm_ops'])],
+            },
+        ),
+        # The list, filters and search read CatalogEntry now, which has its own copies of these
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_active_name_prefix_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_name_trgm_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_search_vector_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productvariant',
+            name='variant_active_price_idx',
+        ),
+        # Initial fill; from here on products.catalog.refresh_catalog keeps it current
+        migrations.RunSQL(
+            """
+            INSERT INTO products_catalogentry (id, product_id, sku, product_name, product_slug, product_description,
+                                               variant_name, price, stock_quantity, category_ids, category_slugs)
+            SELECT v.id, p.id, v.sku, p.name, p.slug, p.description, v.variant_name, v.price, v.stock_quantity,
+                   COALESCE(cats.ids, '{}'), COALESCE(cats.slugs, '{}')
+            FROM products_productvariant v
+            JOIN products_product p ON p.id = v.product_id
+            LEFT JOIN LATERAL (
+                SELECT array_agg(c.id ORDER BY c.path) AS ids, array_agg(c.slug ORDER BY c.path) AS slugs
+                FROM products_category c
+                WHERE EXISTS (
+                    SELECT 1
+                    FROM products_product_category pc JOIN products_category a ON a.id = pc.category_id
+                    WHERE pc.product_id = p.id AND a.path LIKE c.path || '%'
+                )
+            ) cats ON true
+            WHERE v.is_active AND p.is_active
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,9 +1,16 @@
 import uuid
+from django.core.exceptions import ValidationError
 from django.db import models
-from .managers import ActiveManager
+from django.db.models import F, Q, Value
+from django.db.models.functions import Cast, Concat, Substr, Upper
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from .managers import ActiveManager, CategoryQuerySet
+from django.utils import timezone
 from django.utils.text import slugify
-from pgvector.django import VectorField
-from .utils import generate_product_embedding
+from pgvector.django import BitField, HalfVectorField, HnswIndex, VectorField
+from .utils import COMPACT_DIMENSIONS, content_hash
 
 # Create your models here.
 
@@ -12,12 +19,54 @@ class Category(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField(blank=True, null=True)
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subcategories')
+    # Materialized path of ids from the root, e.g. "/2/7/". A subtree is one
+    # indexed prefix match (path LIKE '/2/%') instead of a recursive query.
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['path'], opclasses=['varchar_pattern_ops'], name='category_path_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+
+        parent_path = self.parent.path if self.parent_id else '/'
+        if self.path and parent_path.startswith(self.path):
+            raise ValidationError("A category can't be moved under itself or one of its subcategories.")
+
+        old_path, old_depth = self.path, self.depth
         super().save(*args, **kwargs)
 
+        # The id is only known after the first insert, so the path is written afterwards
+        new_path = f"{parent_path}{self.pk}/"
+        if new_path == old_path:
+            return
+
+        new_depth = new_path.count('/') - 2
+        Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+        if old_path:
+            # Moved: re-prefix the whole subtree in a single UPDATE
+            Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+                depth=F('depth') + (new_depth - old_depth),
+            )
+        self.path, self.depth = new_path, new_depth
+
+        if old_path:
+            # The post_save refresh ran before the paths above changed (and .update()
+            # sends no signal), so the entries' ancestors are brought up to date here
+            from .catalog import refresh_category
+            refresh_category(self.pk)
+
+    @property
+    def ancestor_ids(self):
+        return [int(part) for part in self.path.strip('/').split('/')[:-1]]
+
     def __str__(self):
         return self.name
 
@@ -29,11 +78,29 @@ class Product(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     category = models.ManyToManyField(Category, related_name='products', blank=True)
-    embedding = VectorField(dimensions=1536, null=True, blank=True)
+    # Hash of the text the product has now vs. the text its embedding (ProductEmbedding) was built from.
+    # When they differ the product waits for the embedding worker (products.tasks).
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    embedding_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    needs_embedding = models.BooleanField(default=True, editable=False)
+    # Kept in sync by Postgres itself; name matches outrank description matches
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config='english')
+            + SearchVector('description', weight='B', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     objects = ActiveManager()
     all_objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=Q(needs_embedding=True), name='product_needs_embedding_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
             base_slug = slugify(self.name)
@@ -43,16 +110,62 @@ class Product(models.Model):
                 unique_slug = f"{base_slug}-{uuid.uuid4().hex[:4]}"
             
             self.slug = unique_slug
-        # Generate embedding if it doesn't exist or if description changed
-        if not self.embedding:
-            combined_text = f"{self.name}: {self.description}"
-            self.embedding = generate_product_embedding(combined_text)
+
+        # No OpenAI call here: just flag the product, a worker embeds it after commit
+        self.content_hash = content_hash(self.embedding_text())
+        self.needs_embedding = self.content_hash != self.embedding_hash
         super().save(*args, **kwargs)
 
+    def embedding_text(self):
+        return f"{self.name}: {self.description}"
+
     def __str__(self):
         return self.name
 
 
+class ProductEmbedding(models.Model):
+    """
+    A product's vectors, kept out of the products table so that catalog and cart
+    queries (and select_related('product')) never read ~7 KB of vector data per row.
+    Only the AI retriever and the embedding worker touch this table.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='vectors')
+    embedding = VectorField(dimensions=1536)
+    # Truncated, half-precision copy (~1 KB instead of ~6 KB) for the first search stage
+    embedding_half = HalfVectorField(dimensions=COMPACT_DIMENSIONS)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Approximate nearest-neighbour search for the AI assistant (L2Distance)
+            HnswIndex(
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_l2_ops'],
+                name='product_embedding_hnsw_idx',
+            ),
+            # Compact first-stage indexes, see VECTOR_SEARCH_MODE
+            HnswIndex(
+                fields=['embedding_half'],
+                m=16,
+                ef_construction=64,
+                opclasses=['halfvec_cosine_ops'],
+                name='product_embedding_half_idx',
+            ),
+            HnswIndex(
+                OpClass(
+                    Cast(models.Func('embedding', function='binary_quantize'), output_field=BitField(length=1536)),
+                    name='bit_hamming_ops',
+                ),
+                m=16,
+                ef_construction=64,
+                name='product_embedding_bit_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Embedding for product {self.product_id}"
 
 
 class ProductVariant(models.Model):
@@ -70,6 +183,12 @@ class ProductVariant(models.Model):
         indexes = [
             models.Index(fields=['sku']),
             models.Index(fields=['is_active']),
+            # Active variants of a product, in id order. Partial on is_active to match ActiveManager.
+            models.Index(
+                fields=['product', 'id'],
+                condition=Q(is_active=True),
+                name='variant_active_product_idx',
+            ),
         ]
 
     def save(self, *args, **kwargs):
@@ -85,3 +204,119 @@ class ProductVariant(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.variant_name}"
 
+
+class StockReservation(models.Model):
+    """
+    Stock held for a pending order until `expires_at`. Availability is
+    stock_quantity minus the unexpired reservations of other orders; see
+    products.reservations.
+    """
+    variant = models.ForeignKey(ProductVariant, on_delete=models.CASCADE, related_name='reservations')
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Held quantity per variant is an index-only sum
+            models.Index(fields=['variant', 'expires_at'], include=['quantity', 'order'], name='reservation_variant_idx'),
+            models.Index(fields=['expires_at'], name='reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} of variant {self.variant_id} for order {self.order_id}"
+
+
+class CatalogEntry(models.Model):
+    """
+    Read model for the public catalog: one row per sellable variant (variant and
+    product both active) with everything the list, filters and search need, so
+    those reads never join variants, products and the category M2M table.
+
+    Written only by products.catalog.refresh_catalog, which the signals call for
+    the rows a write touches; never edit it directly.
+    """
+    # Same id as the ProductVariant, so keyset cursors work on both
+    id = models.BigIntegerField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    sku = models.CharField(max_length=100)
+    product_name = models.CharField(max_length=200)
+    product_slug = models.SlugField()
+    product_description = models.TextField()
+    variant_name = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    stock_quantity = models.PositiveIntegerField()
+    # The product's categories and all their ancestors, so a subtree filter is one
+    # array containment check (GIN) instead of a path join
+    category_ids = ArrayField(models.BigIntegerField(), default=list)
+    category_slugs = ArrayField(models.CharField(max_length=50), default=list)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('product_name', weight='A', config='english')
+            + SearchVector('product_description', weight='B', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        verbose_name_plural = 'catalog entries'
+        indexes = [
+            # Keyset pagination orderings (see VariantCursorPagination)
+            models.Index(fields=['product', 'id'], name='catalog_product_idx'),
+            models.Index(fields=['price', 'id'], include=['stock_quantity'], name='catalog_price_idx'),
+            GinIndex(fields=['category_ids'], name='catalog_category_ids_idx'),
+            models.Index(OpClass(Upper('product_name'), name='text_pattern_ops'), name='catalog_name_prefix_idx'),
+            GinIndex(fields=['search_vector'], name='catalog_search_vector_idx'),
+            GinIndex(fields=['product_name'], opclasses=['gin_trgm_ops'], name='catalog_name_trgm_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_name} - {self.variant_name}"
+
+
+class CatalogChange(models.Model):
+    """
+    Append-only log of CatalogEntry writes, read by the /changes?since=<seq> sync API.
+    `seq` orders the log; writers append under an advisory lock held until commit,
+    so seqs become visible in order.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OP_CHOICES = (
+        (UPSERT, 'Upsert'),
+        (DELETE, 'Delete'),
+    )
+
+    seq = models.BigAutoField(primary_key=True)
+    entry_id = models.BigIntegerField()
+    sku = models.CharField(max_length=100)
+    op = models.CharField(max_length=6, choices=OP_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"#{self.seq} {self.op} {self.sku}"
+
+
+class EmbeddingCache(models.Model):
+    """
+    Every embedding we've paid for, keyed by model and sha256 of the normalized
+    text, so the same text is never sent to the API twice.
+    """
+    model = models.CharField(max_length=100)
+    text_hash = models.CharField(max_length=64)
+    embedding = VectorField(dimensions=1536)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'text_hash'], name='unique_embedding_cache_key'),
+        ]
+        indexes = [
+            models.Index(fields=['last_used_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.text_hash[:12]}"
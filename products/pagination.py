@@ -0,0 +1,189 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .models import CatalogEntry
+
+
+def cursor_int(value):
+    if type(value) is not int:
+        raise ValueError(value)
+    return value
+
+
+def cursor_decimal(field):
+    """
+    Parser for a DecimalField's values. Anything the column couldn't hold is refused
+    here; Postgres would reject a value like 1e200000 with an error, not a 404.
+    """
+    def parse(value):
+        decimal = Decimal(value) if isinstance(value, str) else None
+        if (
+            decimal is None or not decimal.is_finite()
+            or decimal.adjusted() >= field.max_digits - field.decimal_places
+            or decimal.as_tuple().exponent < -field.decimal_places
+        ):
+            raise ValueError(value)
+        return decimal
+    return parse
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite, unique ordering.
+
+    The cursor holds the ordering values of the last row a client has seen, so every
+    page is a "WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n" range scan on the matching
+    index. Unlike OFFSET, page 1000 costs the same as page 1.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering_query_param = 'ordering'
+    page_size = settings.CATALOG_PAGE_SIZE
+    max_page_size = settings.CATALOG_MAX_PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Every ordering must end in a unique column so the cursor position is unambiguous.
+    orderings = {}
+    default_ordering = None
+    # How each ordering field's cursor value is checked and parsed (cursor_int, ...)
+    cursor_types = {}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        cursor = self.decode_cursor(request)
+        if cursor:
+            self.ordering, reverse, position = cursor
+        else:
+            self.ordering, reverse, position = self.get_ordering(request), False, None
+
+        fields = list(self.orderings[self.ordering])
+        if reverse:
+            fields = [self._flip(field) for field in fields]
+
+        if position is not None:
+            queryset = queryset.filter(self._after(fields, position))
+
+        # Fetch one extra row to know if there is another page without a COUNT(*)
+        results = list(queryset.order_by(*fields)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in self.orderings:
+            return ordering
+        return self.default_ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(reverse=False, row=self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(reverse=True, row=self.page[0])
+
+    def encode_cursor(self, reverse, row):
+        position = [self._json_value(self._row_value(row, field)) for field in self.orderings[self.ordering]]
+        payload = json.dumps({'o': self.ordering, 'r': int(reverse), 'p': position}, separators=(',', ':'))
+        encoded = urlsafe_b64encode(payload.encode('ascii')).decode('ascii').rstrip('=')
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.ordering_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        # A cursor comes from the client, so anything wrong with it is a 404, never a 500
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+            ordering, reverse, position = payload['o'], bool(payload['r']), payload['p']
+            fields = self.orderings[ordering]
+            if not isinstance(position, list) or len(position) != len(fields):
+                raise ValueError(position)
+            position = [self.cursor_types[field.lstrip('-')](value) for field, value in zip(fields, position)]
+        except (TypeError, ValueError, KeyError, InvalidOperation):
+            raise NotFound(self.invalid_cursor_message)
+        return ordering, reverse, position
+
+    def _after(self, fields, position):
+        # Expands (a, b) > (x, y) into a > x OR (a = x AND b > y)
+        condition = Q()
+        for index, field in enumerate(fields):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f"{field.lstrip('-')}__{lookup}": position[index]})
+            for prior, value in zip(fields[:index], position):
+                term &= Q(**{prior.lstrip('-'): value})
+            condition |= term
+        return condition
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _row_value(row, field):
+        name = field.lstrip('-')
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+    @staticmethod
+    def _json_value(value):
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+
+class VariantCursorPagination(KeysetPagination):
+    orderings = {
+        'product': ('product_id', 'id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        # Ids only ever grow, so the newest variants have the highest ones
+        'newest': ('-id',),
+    }
+    default_ordering = 'product'
+    cursor_types = {
+        'product_id': cursor_int,
+        'id': cursor_int,
+        'price': cursor_decimal(CatalogEntry._meta.get_field('price')),
+    }
@@ -0,0 +1,102 @@
+"""
+Soft stock reservations. Checkout reserves what the order needs for
+STOCK_RESERVATION_TTL seconds; the payment task turns the order's reservations
+into a stock decrement, and the sweeper drops expired ones.
+
+Every function that reads availability expects the variants to be locked
+(select_for_update) in the caller's transaction, so two checkouts can't both
+take the last unit.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from .models import ProductVariant, StockReservation
+
+
+class InsufficientStock(Exception):
+    """
+    Some variants don't have enough unreserved stock; `variants` lists them.
+    """
+    def __init__(self, variants):
+        super().__init__(', '.join(variant.variant_name for variant in variants))
+        self.variants = variants
+
+
+def held_quantities(variant_ids, exclude_order=None):
+    """
+    {variant id: quantity held by unexpired reservations}, other orders only if
+    `exclude_order` is given.
+    """
+    reservations = StockReservation.objects.filter(variant_id__in=variant_ids, expires_at__gt=timezone.now())
+    if exclude_order is not None:
+        reservations = reservations.exclude(order=exclude_order)
+    return dict(reservations.values('variant_id').annotate(held=Sum('quantity')).values_list('variant_id', 'held'))
+
+
+def lock_variants(variant_ids):
+    # Always in id order, so concurrent checkouts can't deadlock
+    return {
+        variant.id: variant
+        for variant in ProductVariant.all_objects.select_for_update().filter(id__in=variant_ids).order_by('id')
+    }
+
+
+def check_available(variants, quantities, exclude_order=None):
+    """
+    Raises InsufficientStock unless every {variant id: quantity} fits in the
+    unreserved stock of the (locked) variants.
+    """
+    held = held_quantities(list(quantities), exclude_order)
+    short = []
+    for variant_id, quantity in quantities.items():
+        variant = variants.get(variant_id)
+        if variant is None:
+            raise ProductVariant.DoesNotExist(f'Variant {variant_id} no longer exists')
+        if not variant.is_active or variant.stock_quantity - held.get(variant_id, 0) < quantity:
+            short.append(variant)
+    if short:
+        raise InsufficientStock(short)
+
+
+def reserve(order, quantities):
+    """
+    Holds {variant id: quantity} for the order. Call inside the transaction that
+    creates the order; raises InsufficientStock (and holds nothing) if it can't.
+    """
+    with transaction.atomic():
+        variants = lock_variants(quantities)
+        check_available(variants, quantities)
+        expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+        StockReservation.objects.bulk_create([
+            StockReservation(variant_id=variant_id, order=order, quantity=quantity, expires_at=expires_at)
+            for variant_id, quantity in quantities.items()
+        ])
+
+
+def release(order):
+    return StockReservation.objects.filter(order=order).delete()[0]
+
+
+RELEASE_EXPIRED = """
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM {table} WHERE expires_at <= now() LIMIT %s FOR UPDATE SKIP LOCKED
+    )
+"""
+
+
+def release_expired(batch_size=1000):
+    """
+    Drops expired reservations a batch per statement (short transactions, and
+    SKIP LOCKED so a payment converting one isn't waited on). Returns the count.
+    """
+    released = 0
+    sql = RELEASE_EXPIRED.format(table=StockReservation._meta.db_table)
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [batch_size])
+            deleted = cursor.rowcount
+        released += deleted
+        if deleted < batch_size:
+            return released
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import F
+from .models import CatalogEntry
+from .serializers import CatalogEntryValues
+
+
+def search_variants(query, limit):
+    """
+    Ranks sellable variants (CatalogEntry rows, as CatalogEntryValues dicts) by
+    full-text match on their product's name/description. Falls back to trigram similarity on the name when nothing matches, which
+    catches typos like "spidr-man" that the stemmer can't.
+    """
+    entries = CatalogEntry.objects.all()
+
+    search_query = SearchQuery(query, config='english', search_type='websearch')
+    results = list(
+        entries.filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F('search_vector'), search_query))
+        .order_by('-rank', 'product_id', 'id')
+        .values(*CatalogEntryValues.lookups)[:limit]
+    )
+    if results:
+        return results
+
+    # `%>` can use the trigram GIN index; its cut-off is a session setting, so
+    # scope ours to this transaction instead of changing it for the connection.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(settings.SEARCH_TRIGRAM_THRESHOLD)],
+            )
+        return list(
+            entries.filter(product_name__trigram_word_similar=query)
+            .annotate(rank=TrigramWordSimilarity(query, 'product_name'))
+            .order_by('-rank', 'product_id', 'id')
+            .values(*CatalogEntryValues.lookups)[:limit]
+        )
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import Product, ProductVariant, Category
 import uuid
 from django.utils.text import slugify
+from planet_core.serialization import ValuesSerializer
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -69,3 +70,47 @@ class ProductVariantDetailSerializer(serializers.ModelSerializer):
             "price",
             "stock_quantity",
         ]
+
+
+class CatalogEntryValues(ValuesSerializer):
+    """
+    Same output as ProductVariantListSerializer, from CatalogEntry rows; `extra`
+    holds the keyset pagination columns.
+    """
+    fields = {
+        "sku": "sku",
+        "product_name": "product_name",
+        "variant_name": "variant_name",
+        "price": "price",
+        "stock_quantity": "stock_quantity",
+    }
+    extra = ("id", "product_id")
+
+
+class ProductVariantDetailValues(ValuesSerializer):
+    fields = {
+        "sku": "sku",
+        "product_name": "product__name",
+        "product_description": "product__description",
+        "variant_name": "variant_name",
+        "price": "price",
+        "stock_quantity": "stock_quantity",
+    }
+
+
+class ProductDetailValues(ValuesSerializer):
+    fields = {
+        "name": "name",
+        "slug": "slug",
+        "description": "description",
+    }
+    extra = ("id",)
+
+
+class ProductVariantValues(ValuesSerializer):
+    fields = {
+        "sku": "sku",
+        "variant_name": "variant_name",
+        "price": "price",
+        "stock_quantity": "stock_quantity",
+    }
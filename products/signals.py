@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Category, Product, ProductVariant
+from .cache import bump_catalog_version
+from .catalog import refresh_catalog, refresh_category
+from .tasks import schedule_embedding_refresh
+
+"""
+Any write to the catalog moves it to a new cache version. Done on commit so a
+concurrent reader can't re-cache the old rows under the new version.
+"""
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(m2m_changed, sender=Product.category.through)
+def invalidate_catalog_cache(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+def queue_product_embedding(sender, instance, **kwargs):
+    if instance.needs_embedding:
+        transaction.on_commit(schedule_embedding_refresh)
+
+
+"""
+The CatalogEntry read model is refreshed in the same transaction as the write,
+only for the rows it touched. Bulk writes that skip signals (the importer) call
+refresh_catalog themselves.
+"""
+
+@receiver(post_save, sender=Product)
+def refresh_product_entries(sender, instance, **kwargs):
+    refresh_catalog(product_ids=[instance.pk])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def refresh_variant_entry(sender, instance, **kwargs):
+    refresh_catalog(variant_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_category_entries(sender, instance, **kwargs):
+    refresh_category(instance.pk)
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+def refresh_categorized_entries(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        refresh_catalog(product_ids=[instance.pk])
+    elif pk_set:
+        refresh_catalog(product_ids=pk_set)
+    else:
+        # category.products.clear(): the entries still know which products had it
+        refresh_category(instance.pk)
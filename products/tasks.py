@@ -0,0 +1,118 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import Product, ProductEmbedding
+from .embeddings import EmbeddingInputError
+from .utils import compact_embedding, generate_product_embeddings
+from .embedding_cache import prune_cache
+from .catalog import prune_changes
+from .reservations import release_expired
+import logging
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SCHEDULED_KEY = 'embeddings:refresh-scheduled'
+
+
+def schedule_embedding_refresh():
+    """
+    Debounced trigger for `embed_pending_products`: the first save in a window
+    schedules one run at the end of it, later saves in the window ride along.
+    """
+    try:
+        if cache.add(REFRESH_SCHEDULED_KEY, 1, timeout=settings.EMBEDDING_DEBOUNCE_SECONDS):
+            embed_pending_products.apply_async(countdown=settings.EMBEDDING_DEBOUNCE_SECONDS)
+    except Exception as e:
+        # The periodic sweep will still pick the products up
+        logger.error(f'Could not schedule embedding refresh: {e}')
+
+
+def embed_isolating(products):
+    """
+    Embeds the products, halving the batch whenever the provider rejects its
+    input, so one bad product doesn't sink the others. Returns the (product,
+    vector) pairs and the products rejected on their own. Transient errors
+    are raised as they are.
+    """
+    try:
+        vectors = generate_product_embeddings([product.embedding_text() for product in products])
+        return list(zip(products, vectors)), []
+    except EmbeddingInputError:
+        if len(products) == 1:
+            return [], products
+
+    middle = len(products) // 2
+    left, left_rejected = embed_isolating(products[:middle])
+    right, right_rejected = embed_isolating(products[middle:])
+    return left + right, left_rejected + right_rejected
+
+
+@shared_task
+def embed_pending_products():
+    """
+    Drains products flagged `needs_embedding`, one embeddings API call per batch.
+    """
+    done, last_id = 0, 0
+    while True:
+        batch = list(
+            Product.all_objects.filter(needs_embedding=True, id__gt=last_id)
+            .only('id', 'name', 'description', 'content_hash')
+            .order_by('id')[:settings.EMBEDDING_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        try:
+            embedded, rejected = embed_isolating(batch)
+        except Exception as e:
+            logger.error(f'Embedding batch failed, will retry on the next run: {e}')
+            break
+
+        if rejected:
+            # Unflag them so they stop costing an API call every run; editing the
+            # product flags it again. Same guard as below against concurrent edits.
+            for product in rejected:
+                Product.all_objects.filter(pk=product.pk, content_hash=product.content_hash).update(needs_embedding=False)
+            logger.error(f'Embedding provider rejected products {[product.pk for product in rejected]}, skipped')
+
+        for product, vector in embedded:
+            with transaction.atomic():
+                # Only lands if nobody edited the product while we were embedding it,
+                # otherwise it stays flagged and gets the newer text next time
+                landed = Product.all_objects.filter(pk=product.pk, content_hash=product.content_hash).update(
+                    embedding_hash=product.content_hash,
+                    needs_embedding=False,
+                )
+                if landed:
+                    ProductEmbedding.objects.update_or_create(
+                        product_id=product.pk,
+                        defaults={'embedding': vector, 'embedding_half': compact_embedding(vector)},
+                    )
+            done += landed
+
+    logger.info(f'Generated embeddings for {done} products')
+    return f"Embedded {done} products."
+
+
+@shared_task
+def prune_embedding_cache():
+    deleted = prune_cache(settings.EMBEDDING_CACHE_MAX_ROWS)
+    logger.info(f'Pruned {deleted} least recently used cached embeddings')
+    return f"Pruned {deleted} cached embeddings."
+
+
+@shared_task
+def prune_catalog_changes():
+    deleted = prune_changes(settings.CATALOG_CHANGES_RETENTION_DAYS)
+    logger.info(f'Pruned {deleted} catalog change log rows')
+    return f"Pruned {deleted} catalog changes."
+
+
+@shared_task
+def release_expired_reservations():
+    released = release_expired(settings.STOCK_RESERVATION_SWEEP_BATCH)
+    if released:
+        logger.info(f'Released {released} expired stock reservations')
+    return f"Released {released} reservations."
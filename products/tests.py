@@ -1,3 +1,60 @@
-from django.test import TestCase
+import threading
+import time
+from decimal import Decimal
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from .catalog import change_log_head, changes_since
+from .models import Product, ProductVariant
 
-# Create your tests here.
+
+class ChangeLogTests(TransactionTestCase):
+    def test_interleaved_writers_are_never_skipped(self):
+        first = Product.objects.create(name='Written first', description='Test product')
+        second = Product.objects.create(name='Logged first', description='Test product')
+        since = change_log_head()
+        a_has_txid, b_logged, b_commit = threading.Event(), threading.Event(), threading.Event()
+        variants = {}
+
+        def writer_a():
+            # Gets its txid with a write that isn't logged, then appends after B
+            try:
+                with transaction.atomic():
+                    Product.objects.filter(pk=first.pk).update(description='Updated')
+                    a_has_txid.set()
+                    b_logged.wait(5)
+                    variants['a'] = ProductVariant.objects.create(
+                        product=first, variant_name='Default', price=Decimal('5.00'), stock_quantity=1,
+                    ).pk
+            finally:
+                connection.close()
+
+        def writer_b():
+            # Appends to the log and stays open
+            try:
+                with transaction.atomic():
+                    variants['b'] = ProductVariant.objects.create(
+                        product=second, variant_name='Default', price=Decimal('5.00'), stock_quantity=1,
+                    ).pk
+                    b_logged.set()
+                    b_commit.wait(5)
+            finally:
+                connection.close()
+
+        a, b = threading.Thread(target=writer_a), threading.Thread(target=writer_b)
+        a.start()
+        a_has_txid.wait(5)
+        b.start()
+        b_logged.wait(5)
+        time.sleep(0.2)  # A's append is now due
+
+        upserts, _, position, _ = changes_since(since, 100)
+        self.assertEqual(upserts, {})
+        self.assertEqual(position, since)
+
+        b_commit.set()
+        a.join(5)
+        b.join(5)
+
+        upserts, _, _, has_more = changes_since(position, 100)
+        self.assertEqual(set(upserts), {variants['a'], variants['b']})
+        self.assertFalse(has_more)
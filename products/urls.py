@@ -1,19 +1,31 @@
 from django.urls import path
 from .views import (
     ProductCreateView,
+    ProductImportView,
+    ProductExportView,
     ProductUpdateView,
+    ProductDetailView,
     VariantDetailView,
     VariantListView,
+    ProductSearchView,
     CategoryCreateView,
+    CategoryTreeView,
+    CatalogChangesView,
 )
 
 urlpatterns = [
     # Public
     path("", VariantListView.as_view(), name="product-list"),
+    path("search/", ProductSearchView.as_view(), name="product-search"),
+    path("categories/", CategoryTreeView.as_view(), name="category-tree"),
+    path("changes/", CatalogChangesView.as_view(), name="catalog-changes"),
+    path("product/<slug:slug>/", ProductDetailView.as_view(), name="product-page"),
     path("<str:sku>/", VariantDetailView.as_view(), name="product-detail"),
 
     # Admin
     path("admin/categories/create/", CategoryCreateView.as_view()),
     path("admin/products/create/", ProductCreateView.as_view(), name="product-create"),
+    path("admin/products/import/", ProductImportView.as_view(), name="product-import"),
+    path("admin/products/export/", ProductExportView.as_view(), name="product-export"),
     path("admin/products/<slug:slug>/update/", ProductUpdateView.as_view(), name="product-update"),
 ]
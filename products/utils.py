@@ -1,7 +1,9 @@
-from django.conf import settings
-from openai import OpenAI
+import hashlib
+import math
+from .embeddings import get_embedding_provider
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# Leading dimensions kept in the compact first-stage vector (Product.embedding_half)
+COMPACT_DIMENSIONS = 512
 
 
 def generate_product_embedding(text):
@@ -10,10 +12,34 @@ def generate_product_embedding(text):
     """
     if not text:
         return None
-        
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-    
-    return response.data[0].embedding
+
+    return generate_product_embeddings([text])[0]
+
+
+def generate_product_embeddings(texts):
+    """
+    Embeds many texts, served from the embedding cache where possible and
+    with batched provider calls for everything that isn't cached yet.
+    """
+    from .embedding_cache import cached_embeddings
+
+    if not texts:
+        return []
+
+    provider = get_embedding_provider()
+    return cached_embeddings(provider.model, texts, provider.embed_many)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compact_embedding(vector):
+    """
+    First COMPACT_DIMENSIONS values of an embedding, re-normalized. The
+    text-embedding-3 models are trained so that a truncated prefix still works
+    as a (slightly coarser) embedding.
+    """
+    head = [float(value) for value in vector[:COMPACT_DIMENSIONS]]
+    norm = math.sqrt(sum(value * value for value in head)) or 1.0
+    return [value / norm for value in head]
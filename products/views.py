@@ -2,11 +2,71 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAdminUser, AllowAny
+import io
+from functools import wraps
+from django.conf import settings
 from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
 
-from .models import Product, ProductVariant
-from .serializers import ProductSerializer, CategorySerializer, ProductVariantListSerializer, ProductVariantDetailSerializer
+from .models import CatalogEntry, Category, Product, ProductVariant
+from .pagination import VariantCursorPagination
+from .cache import catalog_etag, catalog_last_modified, get_or_build
+from .filters import filter_variants, variant_facets, TRUTHY
+from .search import search_variants
+from .importer import CatalogImporter, read_rows
+from .exporter import CONTENT_TYPES, export_catalog
+from .catalog import ChangeLogGap, change_log_head, changes_since
+from .serializers import (
+    ProductSerializer, CategorySerializer,
+    CatalogEntryValues, ProductVariantDetailValues, ProductDetailValues, ProductVariantValues,
+)
+from planet_core.serialization import FAST_RENDERERS, gzip_response
+
+
+def catalog_conditional(name):
+    """
+    ETag/Last-Modified from the catalog version for a GET handler. A matching
+    If-None-Match or If-Modified-Since gets a 304 before the handler runs, so
+    nothing is queried or serialized. `name(request, **kwargs)` identifies the
+    resource, like the get_or_build names.
+    """
+    return method_decorator(condition(
+        etag_func=lambda request, *args, **kwargs: catalog_etag(name(request, **kwargs)),
+        last_modified_func=lambda request, *args, **kwargs: catalog_last_modified(),
+    ))
+
+
+def catalog_detail_conditional(name):
+    """
+    catalog_conditional for a single object that may not exist. The validators are
+    only sent, and only checked, once the handler found it, so an unknown SKU or
+    slug is a plain 404 and never a 304. The handler reads the catalog cache, so a
+    304 for a cached object still costs no query.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(request, *args, **kwargs):
+            # Taken before the body is read: a version bump in between can only make them stale
+            etag = catalog_etag(name(request, **kwargs))
+            last_modified = catalog_last_modified()
+            response = handler(request, *args, **kwargs)
+            if not 200 <= response.status_code < 300:
+                return response
+
+            etag = quote_etag(etag) if etag else None
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+            if etag:
+                response.headers.setdefault('ETag', etag)
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+        return wrapper
+    return method_decorator(decorator)
 
 
 class CategoryCreateView(APIView):
@@ -26,6 +86,37 @@ class CategoryCreateView(APIView):
 
 
 
+class CategoryTreeView(APIView):
+    permission_classes = [AllowAny]
+
+    @catalog_conditional(lambda request: "categories:tree")
+    def get(self, request):
+        return Response(get_or_build("categories:tree", self.build_tree))
+
+    def build_tree(self):
+        # Ordering by path puts every parent before its children
+        categories = Category.objects.with_product_counts().order_by("path").values(
+            "id", "parent_id", "name", "slug", "description", "product_count"
+        )
+
+        nodes, roots = {}, []
+        for category in categories:
+            node = {
+                "name": category["name"],
+                "slug": category["slug"],
+                "description": category["description"],
+                "product_count": category["product_count"],
+                "subcategories": [],
+            }
+            nodes[category["id"]] = node
+            if category["parent_id"]:
+                nodes[category["parent_id"]]["subcategories"].append(node)
+            else:
+                roots.append(node)
+        return roots
+
+
+
 class ProductCreateView(APIView):
     permission_classes = [IsAdminUser]
 
@@ -45,6 +136,44 @@ class ProductCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ProductImportView(APIView):
+    """
+    Bulk catalog import: upload a CSV or JSONL file as `file` (multipart).
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"error": "Upload a CSV or JSONL file as 'file'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get("file_format") or ("csv" if upload.name.lower().endswith(".csv") else "jsonl")
+        if file_format not in ("csv", "jsonl"):
+            return Response({"error": "file_format must be 'csv' or 'jsonl'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read straight from the uploaded file, row by row
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        report = CatalogImporter().run(read_rows(stream, file_format))
+        return Response(report.as_dict(), status=status.HTTP_201_CREATED)
+
+
+class ProductExportView(APIView):
+    """
+    Streams the whole sellable catalog as CSV or JSONL (`?file_format=`, default
+    jsonl). Not `?format=`, which DRF reserves for picking a renderer.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        file_format = request.query_params.get("file_format", "jsonl")
+        if file_format not in CONTENT_TYPES:
+            return Response({"error": "file_format must be 'csv' or 'jsonl'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(export_catalog(file_format), content_type=CONTENT_TYPES[file_format])
+        response["Content-Disposition"] = f'attachment; filename="catalog.{file_format}"'
+        return response
+
+
 class ProductUpdateView(APIView):
     permission_classes = [IsAdminUser]
 
@@ -63,26 +192,146 @@ class ProductUpdateView(APIView):
 
 class VariantListView(APIView):
     permission_classes = [AllowAny]
+    pagination_class = VariantCursorPagination
+    renderer_classes = FAST_RENDERERS
 
+    @gzip_response
+    @catalog_conditional(lambda request: f"variants:{request.build_absolute_uri()}")
     def get(self, request):
-        variants = ProductVariant.objects.filter(
-            is_active=True,
-            product__is_active=True
-        ).select_related("product")
+        # The full URL is the cache key: cursor, page size and ordering all change the page
+        data = get_or_build(f"variants:{request.build_absolute_uri()}", lambda: self.build_page(request))
+        return Response(data)
+
+    def build_page(self, request):
+        # The denormalized read model: no joins, only sellable variants
+        variants = filter_variants(CatalogEntry.objects.all(), request.query_params)
+
+        # Plain rows straight from .values(), no model instances or serializer fields
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(CatalogEntryValues.values(variants), request, view=self)
+        data = paginator.get_paginated_response(CatalogEntryValues.many(page)).data
 
-        serializer = ProductVariantListSerializer(variants, many=True)
-        return Response(serializer.data)
+        # Facets cost an extra aggregate, so clients ask for them explicitly
+        if request.query_params.get('facets', '').lower() in TRUTHY:
+            data['facets'] = variant_facets(variants)
+        return data
 
 class VariantDetailView(APIView):
     permission_classes = [AllowAny]
+    renderer_classes = FAST_RENDERERS
 
+    @catalog_detail_conditional(lambda request, sku: f"variant:{sku}")
     def get(self, request, sku):
+        data = get_or_build(f"variant:{sku}", lambda: self.build_detail(sku))
+        return Response(data)
+
+    def build_detail(self, sku):
         variant = get_object_or_404(
-            ProductVariant.objects.select_related("product"),
+            ProductVariantDetailValues.values(ProductVariant.objects.all()),
             sku=sku,
             is_active=True,
             product__is_active=True
         )
-        serializer = ProductVariantDetailSerializer(variant)
-        return Response(serializer.data)
+        return ProductVariantDetailValues.to_representation(variant)
+
+
+
+class ProductDetailView(APIView):
+    """
+    Everything a product page needs: the product, its active variants and a
+    breadcrumb trail per category. Three queries, whatever the product has.
+    """
+    permission_classes = [AllowAny]
+    renderer_classes = FAST_RENDERERS
+
+    @catalog_detail_conditional(lambda request, slug: f"product:{slug}")
+    def get(self, request, slug):
+        data = get_or_build(f"product:{slug}", lambda: self.build_product(slug))
+        return Response(data)
+
+    def build_product(self, slug):
+        product = get_object_or_404(ProductDetailValues.values(Product.objects.all()), slug=slug)
+
+        variants = ProductVariant.objects.filter(product_id=product["id"]).order_by("price", "id")
+        # Ordering by path puts every ancestor before its descendants
+        categories = Category.objects.lineage_of_product(product["id"]).order_by("path").values(
+            "id", "name", "slug", "path", "assigned"
+        )
+
+        nodes, trails = {}, []
+        for category in categories:
+            nodes[category["id"]] = {"name": category["name"], "slug": category["slug"]}
+            if category["assigned"]:
+                trail = [int(part) for part in category["path"].strip("/").split("/")]
+                trails.append({
+                    **nodes[category["id"]],
+                    "breadcrumbs": [nodes[category_id] for category_id in trail],
+                })
+
+        return {
+            **ProductDetailValues.to_representation(product),
+            "variants": ProductVariantValues.many(ProductVariantValues.values(variants)),
+            "categories": trails,
+        }
+
+
+
+class CatalogChangesView(APIView):
+    """
+    Incremental sync. Without `since` it returns the current position only: take
+    it, do a full export, then poll `?since=<next>` for what changed after that.
+    """
+    permission_classes = [AllowAny]
+    renderer_classes = FAST_RENDERERS
+
+    @gzip_response
+    def get(self, request):
+        since = request.query_params.get("since")
+        if since is None:
+            return Response({"next": change_log_head(), "has_more": False, "upserts": [], "deletes": []})
+
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({"error": "since must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            upserts, deletes, position, has_more = changes_since(since, settings.CATALOG_CHANGES_PAGE_SIZE)
+        except ChangeLogGap:
+            return Response(
+                {"error": "Changes this old are no longer kept, re-sync from a full export"},
+                status=status.HTTP_410_GONE,
+            )
+
+        entries = CatalogEntryValues.many(CatalogEntryValues.values(CatalogEntry.objects.filter(id__in=upserts)))
+        # Removed again after the window we read: report it as deleted
+        found = {entry["sku"] for entry in entries}
+        deletes += [sku for sku in upserts.values() if sku not in found]
+
+        return Response({"next": position, "has_more": has_more, "upserts": entries, "deletes": deletes})
+
+
+
+class ProductSearchView(APIView):
+    permission_classes = [AllowAny]
+    renderer_classes = FAST_RENDERERS
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "A search term is required (?q=...)"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", settings.CATALOG_PAGE_SIZE)), settings.CATALOG_MAX_PAGE_SIZE))
+        except ValueError:
+            limit = settings.CATALOG_PAGE_SIZE
+
+        data = get_or_build(f"search:{limit}:{query.lower()}", lambda: self.build_results(query, limit))
+        return Response(data)
 
+    def build_results(self, query, limit):
+        variants = search_variants(query, limit)
+        return {
+            "query": query,
+            "results": CatalogEntryValues.many(variants),
+        }